@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+# no window is needed to time drawing, SDL can render to memory
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+import game
+from headless import RandomInput
+from profiler import PhaseTimer, PHASES
+from replay import loadReplay
+from sprites import convertSprites
+
+
+def runBenchmark(numEnemies, frames, backend='objects', seed=0,
+                 dirtyRects=False):
+    """Runs the game loop for frames frames with numEnemies EnemyFish
+
+    Whenever the player wins or loses a new game starts right away so
+    every frame is spent playing. Returns a dict of the results.
+    """
+    game.NUMENEMYFISH = numEnemies
+    timer = PhaseTimer()
+    updater = game.ScreenUpdater(dirtyRects)
+    restarts = 0
+
+    def newWorld():
+        world = game.World(seed + restarts, RandomInput(seed + restarts),
+                           backend, timer)
+        world.tick = game.TEXTTIME * game.FPS  # skip the instructions
+        return world
+
+    world = newWorld()
+    startTime = time.perf_counter()
+    for _ in range(frames):
+        playFrame(world, timer, updater)
+        if world.winMode or world.gameOverMode:
+            restarts += 1
+            world = newWorld()
+    elapsed = time.perf_counter() - startTime
+
+    return {'backend': backend,
+            'dirty_rects': dirtyRects,
+            'enemies': numEnemies,
+            'frames': frames,
+            'restarts': restarts,
+            'fps': frames / elapsed,
+            'phases': timer.summary()}
+
+
+def runReplay(path, backend='objects', dirtyRects=False):
+    """Plays back every game recorded in the replay file path with the
+    settings it was recorded with, returns a dict of the results
+    """
+    replay = loadReplay(path)
+    game.useSettings(replay.settings)
+    timer = PhaseTimer()
+    updater = game.ScreenUpdater(dirtyRects)
+    frames = 0
+    startTime = time.perf_counter()
+    for i, recorded in enumerate(replay.games):
+        world = game.World(recorded['seed'], replay.play(i), backend, timer)
+        while not world.done:
+            playFrame(world, timer, updater)
+            frames += 1
+    elapsed = time.perf_counter() - startTime
+
+    return {'backend': backend,
+            'dirty_rects': dirtyRects,
+            'replay': path,
+            'enemies': game.NUMENEMYFISH,
+            'frames': frames,
+            'games': len(replay.games),
+            'fps': frames / elapsed,
+            'phases': timer.summary()}
+
+
+def playFrame(world, timer, updater):
+    """Draws world and steps it one tick like the game loop does"""
+    with timer.phase('draw'):
+        updater.erase(world.camera)
+        updater.update(game.drawWorld(world))
+    world.step()
+    timer.endFrame()
+
+
+def compare(results, baseline, tolerance):
+    """Returns a line for each phase slower than baseline by more than
+    tolerance (a fraction, 0.2 is 20% slower)
+    """
+    def key(run):
+        return (run['backend'], run['enemies'], run.get('dirty_rects'),
+                run.get('replay'))
+
+    old = dict((key(run), run) for run in baseline['runs'])
+    regressions = []
+    for run in results['runs']:
+        if key(run) not in old:
+            continue
+        for phase, stats in run['phases'].items():
+            before = old[key(run)]['phases'].get(phase)
+            if not before or before['mean_ms'] <= 0:
+                continue
+            ratio = stats['mean_ms'] / before['mean_ms']
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    '%s, %d enemies, %s: %.3f ms -> %.3f ms (%+.0f%%)' %
+                    (run['backend'], run['enemies'], phase,
+                     before['mean_ms'], stats['mean_ms'],
+                     100 * (ratio - 1)))
+    return regressions
+
+
+def main():
+    """Benchmarks the game loop and prints the results as JSON"""
+    parser = argparse.ArgumentParser(
+        description='Time each phase of the Fishy game loop')
+    parser.add_argument('--enemies', type=int, nargs='+',
+                        default=[30, 300, 1000, 10000],
+                        help='EnemyFish counts to run, one run each')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--backend', nargs='+', default=['objects'],
+                        choices=('objects', 'numpy'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='only redraw the screen areas that changed')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='play back the games recorded in FILE instead '
+                             'of running --enemies')
+    parser.add_argument('--output', help='write JSON here, not stdout')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='JSON from an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='slowdown allowed by --compare (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    pygame.init()
+    game.SCREEN = pygame.display.set_mode((game.WINDOW_WIDTH,
+                                           game.WINDOW_HEIGHT))
+    convertSprites()
+
+    results = {'python': platform.python_version(),
+               'pygame': pygame.version.ver,
+               'seed': args.seed,
+               'phases': list(PHASES),
+               'runs': []}
+    for backend in args.backend:
+        if args.replay:
+            results['runs'].append(runReplay(args.replay, backend,
+                                             args.dirty_rects))
+            continue
+        for numEnemies in args.enemies:
+            results['runs'].append(runBenchmark(numEnemies, args.frames,
+                                                backend, args.seed,
+                                                args.dirty_rects))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            sys.stderr.write('slower: %s\n' % line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
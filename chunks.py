@@ -0,0 +1,142 @@
+import random
+from collections import OrderedDict
+import pygame
+from fish import MINSPEED, MAXSPEED
+
+# Constants
+CHUNKSIZE = 512        # sidelength of a square chunk in pixels
+FISHPERCHUNK = 3       # EnemyFish generated in a new chunk
+MAXFROZENCHUNKS = 256  # unloaded chunks remembered before regenerating
+
+
+class ChunkStreamer(object):
+    """Streams EnemyFish in and out of the game a chunk at a time
+
+    The ocean is split into square chunks. Chunks touching the camera's
+    active area are loaded and their fish simulated. Fish outside the
+    loaded chunks are frozen into the chunk they are in and come back
+    when it loads again. A chunk loaded for the first time, or one
+    forgotten to keep at most maxFrozen chunks in memory, is generated
+    from the seed and its position.
+
+    Frozen fish are stored as (x, y, vx, vy, size) tuples.
+
+    Attributes:
+        seed:           Seed every chunk's fish are generated from
+        chunksize:      Sidelength of a chunk in pixels
+        fishPerChunk:   EnemyFish generated in a new chunk
+        maxFrozen:      Most unloaded chunks remembered
+        loaded:         Range of loaded chunks as (x0, y0, x1, y1)
+        frozen:         Frozen fish of each unloaded chunk, oldest first
+
+    Key Methods:
+        load:   Loads the chunks entering the active area
+        freeze: Freezes the fish that left the loaded chunks
+    """
+
+    def __init__(self, seed, chunksize=CHUNKSIZE, fishPerChunk=FISHPERCHUNK,
+                 maxFrozen=MAXFROZENCHUNKS):
+        if chunksize <= 0:
+            raise ValueError('chunksize must be positive')
+        self.seed = seed
+        self.chunksize = chunksize
+        self.fishPerChunk = fishPerChunk
+        self.maxFrozen = maxFrozen
+        self.loaded = None
+        self.frozen = OrderedDict()
+        self._generated = set()  # loaded or frozen chunks made already
+
+    def chunkOf(self, x, y):
+        """Returns the chunk containing the point x, y"""
+        return int(x // self.chunksize), int(y // self.chunksize)
+
+    def _chunks(self, span):
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                yield cx, cy
+
+    def load(self, enemies, camera, player):
+        """Loads the chunks touching the camera's active area into
+        enemies, returns how many fish were added
+        """
+        area = camera.getActiveArea()
+        cx0, cy0 = self.chunkOf(area.left, area.top)
+        cx1, cy1 = self.chunkOf(area.right - 1, area.bottom - 1)
+        span = (cx0, cy0, cx1, cy1)
+        if span == self.loaded:
+            return 0
+
+        old, self.loaded = self.loaded, span
+        states = []
+        for chunk in self._chunks(span):
+            if old is None or not _inside(chunk, old):
+                states += self._wake(chunk, camera, player)
+        if old is not None:
+            # remember the chunks left behind, even empty ones
+            for chunk in self._chunks(old):
+                if not _inside(chunk, span):
+                    self.frozen.setdefault(chunk, [])
+            self._forget()
+        enemies.addFish(states)
+        return len(states)
+
+    def freeze(self, enemies):
+        """Takes the fish outside the loaded chunks out of enemies and
+        stores them in their chunks, returns how many were frozen
+        """
+        cs = self.chunksize
+        x0, y0, x1, y1 = self.loaded
+        region = pygame.Rect(x0 * cs, y0 * cs,
+                             (x1 - x0 + 1) * cs, (y1 - y0 + 1) * cs)
+        states = enemies.takeFishOutside(region)
+        for state in states:
+            chunk = self.chunkOf(state[0], state[1])
+            self.frozen.setdefault(chunk, []).append(state)
+            self.frozen.move_to_end(chunk)
+        self._forget()
+        return len(states)
+
+    def _wake(self, chunk, camera, player):
+        """Returns the fish of a chunk that is being loaded"""
+        states = []
+        if chunk not in self._generated:
+            self._generated.add(chunk)
+            states = self._generate(chunk, camera, player)
+        return states + self.frozen.pop(chunk, [])
+
+    def _generate(self, chunk, camera, player):
+        """Returns new fish for chunk, the same every time for the same
+        seed and player size
+
+        Fish that would appear in the camera view are left out.
+        """
+        cx, cy = chunk
+        rng = random.Random('%d:%d:%d' % (self.seed, cx, cy))
+        low = int(player.size - 2 * player.size ** 0.5)
+        high = int(player.size + player.size ** 0.5)
+        view = camera.getView()
+        states = []
+        for _ in range(self.fishPerChunk):
+            size = rng.randint(low, high)
+            x = (cx + rng.random()) * self.chunksize
+            y = (cy + rng.random()) * self.chunksize
+            vx = rng.randint(MINSPEED, MAXSPEED) * rng.choice((-1, 1))
+            vy = rng.randint(MINSPEED, MAXSPEED) * rng.choice((-1, 1))
+            if not view.colliderect(pygame.Rect(x, y, size, size)):
+                states.append((x, y, vx, vy, size))
+        return states
+
+    def _forget(self):
+        """Drops the oldest frozen chunks beyond maxFrozen, they will
+        be generated again if they load
+        """
+        while len(self.frozen) > self.maxFrozen:
+            chunk, _ = self.frozen.popitem(last=False)
+            self._generated.discard(chunk)
+
+
+def _inside(chunk, span):
+    """Returns if chunk is in the range of chunks span"""
+    x0, y0, x1, y1 = span
+    return x0 <= chunk[0] <= x1 and y0 <= chunk[1] <= y1
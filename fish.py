@@ -3,6 +3,7 @@ from pygame.locals import *
 import random
 import math
 import sys
+from sprites import Sprite
 
 # Constants
 #   Player
@@ -10,20 +11,20 @@ MAXSPEEDPLAYER = 12  # fastest player speed
 PLAYERACC = 2        # keydown accelaration
 PLAYERDRAG = 1       # natural deceleration rate
 STARTSIZE = 25       # starting player size
-L_PLAYER_IMG = pygame.image.load('./img/Player.png')
-R_PLAYER_IMG = pygame.transform.flip(L_PLAYER_IMG, True, False)
+PLAYER_SPRITE = Sprite('Player.png', 'left')
 
 #   EnemyFish
 MINSPEED = 2         # slowest other fish speed
 MAXSPEED = 4         # fastest other fish speed
 DIRCHANGEFREQ = 2    # % chance of direction change per frame
-R_FISH_IMG = pygame.image.load('./img/EnemyFish.png')
-L_FISH_IMG = pygame.transform.flip(R_FISH_IMG, True, False)
+FISH_SPRITE = Sprite('EnemyFish.png', 'right')
 
 #   Shark
 SHARKSPEED = 4  # speed the shark moves towards the player
-L_SHARK_IMG = pygame.image.load('./img/Shark.png')
-R_SHARK_IMG = pygame.transform.flip(L_SHARK_IMG, True, False)
+SHARK_SPRITE = Sprite('Shark.png', 'left')
+
+#   FishPool
+MAXPOOLSIZE = 4096  # most removed enemies kept for reuse per type
 
 # Confirm values won't cause issues
 #   Confirm acceleration isn't equal to drag
@@ -51,69 +52,85 @@ class Fish(object):
     """Abstract superclass for player and enemies
 
     Attributes:
-        L_image, R_image:   Left, Right facing images of the Fish
-        image:              The current fish image that will be drawn
+        sprite:             Left, Right facing images of the Fish
+        facing:             Left or right, picks which image is drawn
         size:               Sidelength size of square fish
         x, y:               Absolute position of the fish
+        lastx, lasty:       Position before the fish last moved
         vx, vy:             Velocity components of the fish
         colrect:            A rectangle to check for collisions
-        camrect:            A rectangle near the camera for drawing
 
     Key Methods:
         move:   Changes the fish's position based on its velocity
-        draw:   Draws the fish on the screen
+        getDrawItem: Returns the fish's entry in a draw list
+        place:  Puts the fish somewhere new, at rest
     """
 
-    def __init__(self, L_image, R_image, x, y, size):
-        self.L_image, self.R_image = L_image, R_image
-        self.image = pygame.transform.scale(L_image, (size, size))
+    # fixed attributes instead of a __dict__ keep many fish small
+    __slots__ = ('sprite', 'facing', 'size', 'x', 'y', 'lastx', 'lasty',
+                 'vx', 'vy', 'colrect')
+
+    def __init__(self, sprite, x, y, size):
+        self.sprite = sprite
+        self.colrect = pygame.Rect(x, y, size, size)
+        self.place(x, y, size)
+
+    def place(self, x, y, size):
+        """Puts the fish at x, y with a new size, at rest, facing left"""
+        self.facing = 'left'
         self.size = size
         self.x, self.y = x, y
+        self.lastx, self.lasty = x, y
         self.vx, self.vy = 0, 0
-        self.colrect = pygame.Rect(x, y, size, size)
-        self.camrect = None
+        self.colrect.update(x, y, size, size)
 
-    def move(self):
-        """Move the fish according to its velocity & update collision rect"""
-        self.y += self.vy
-        self.x += self.vx
-        self.colrect = pygame.Rect(self.x, self.y, self.size, self.size)
+    def move(self, steps=1):
+        """Move the fish according to its velocity & update collision rect
 
-    def draw(self, screen, camera):
-        """Draws the fish in the game"""
-        self.camrect = pygame.Rect(self.x - camera.x,
-                                   self.y - camera.y,
-                                   self.size, self.size)
-        screen.blit(self.image, self.camrect)
+        steps moves it that many frames' worth at once
+        """
+        self.lastx, self.lasty = self.x, self.y
+        self.y += self.vy * steps
+        self.x += self.vx * steps
+        self.colrect.update(self.x, self.y, self.size, self.size)
+
+    def getDrawItem(self, camerax, cameray, back=0):
+        """Returns (size, sprite, facing, left, top) for drawing the fish
+        with sprites.blitBySize, the camera at camerax, cameray and the
+        fish back of the way to where it was before its last move
+        """
+        # truncate toward zero like a Rect does
+        return (self.size, self.sprite, self.facing,
+                int(self.x - (self.x - self.lastx) * back - camerax),
+                int(self.y - (self.y - self.lasty) * back - cameray))
 
 
 class Player(Fish):
     """The player fish that listens for keyboard events to determine movement
 
     Attributes(*denotes not part of parent Fish class):
-        L_image, R_image:   Left, Right facing images of Fish
-        image:              The current fish image that will be drawn
+        sprite:             Left, Right facing images of Fish
+        facing:             Left or right, picks which image is drawn
         size:               Sidelength size of square fish
         x, y:               Absolute position of the fish
+        lastx, lasty:       Position before the fish last moved
         vx, vy:             Velocity components of the fish
         *accx, accy:        Acceleration components of the fish
         colrect:            A rectangle to check for collisions
-        camrect:            A rectangle near the camera for drawing
         *health:            Times player hit by bigger fish for gameover
-        *facing:            Left or right for drawing new size after eating
 
     Additional Methods:
         eat(Fish):  player eats a smaller fish and grows
     """
 
+    __slots__ = ('accx', 'accy', 'health')
+
     def __init__(self, x, y):
-        super(Player, self).__init__(L_PLAYER_IMG, R_PLAYER_IMG,
-                                     x, y, STARTSIZE)
+        super(Player, self).__init__(PLAYER_SPRITE, x, y, STARTSIZE)
         self.accx, self.accy = 0, 0
         self.health = 3
-        self.facing = 'left'
 
-    def move(self):
+    def move(self, events=None):
         """Move the player
 
         If a directional key is being pressed, accelerate in that direction
@@ -121,8 +138,13 @@ class Player(Fish):
 
         If directional key isn't pressed, slow fish down according
         to deceleration equal to PLAYERDRAG until velocity is 0
+
+        events is the list of keyboard events for this frame, they are
+        pulled from pygame.event if not given
         """
-        for event in pygame.event.get():  # event handling loop
+        if events is None:
+            events = pygame.event.get()
+        for event in events:  # event handling loop
             # if window is closed, terminate game processes and python
             if event.type == QUIT:
                 pygame.display.quit()
@@ -136,19 +158,13 @@ class Player(Fish):
                 elif event.key in (K_DOWN, K_s):
                     self.accy = PLAYERACC
 
-                # for left and right, update the image as well
+                # for left and right, update the facing as well
                 elif event.key in (K_LEFT, K_a):
                     self.facing = 'left'
                     self.accx = -1 * PLAYERACC
-                    self.image = pygame.transform.scale(self.L_image,
-                                                        (self.size,
-                                                         self.size))
                 elif event.key in (K_RIGHT, K_d):
                     self.facing = 'right'
                     self.accx = PLAYERACC
-                    self.image = pygame.transform.scale(self.R_image,
-                                                        (self.size,
-                                                         self.size))
 
             # decelerate when keys are unpressed
             elif event.type == KEYUP:
@@ -186,89 +202,102 @@ class Player(Fish):
     def eat(self, fish):
         """player grows according to size of eaten fish"""
         self.size += int(fish.size ** 0.3)
-        # update display
-        if self.facing == "left":
-            self.image = pygame.transform.scale(self.L_image,
-                                                (self.size,
-                                                 self.size))
-        else:
-            self.image = pygame.transform.scale(self.R_image,
-                                                (self.size,
-                                                 self.size))
 
 
 class EnemyFish(Fish):
     """Fish that move randomly
     Attributes(* denotes not part of parent Fish class):
-        L_image, R_image:   Left, Right facing images of Fish
-        image:              The current fish image that will be drawn
+        sprite:             Left, Right facing images of Fish
+        facing:             Left or right, picks which image is drawn
         size:               Sidelength size of square fish
         x, y:               Absolute position of the fish
+        lastx, lasty:       Position before the fish last moved
         vx, vy:             Velocity components of the fish
         colrect:            A rectangle to check for collisions
-        camrect:            A rectangle near the camera for drawing
         *etype:             Enemy type used for tracking in game file
+        *rng:               Random number source (random module or a
+                            seeded random.Random)
+        *dirchangefreq:     % chance per frame of changing direction
+        *lodphase:          Which frames the fish moves on when far away
+        *lodinterval:       Frames between the fish's moves
+        *lastmove:          Frame the fish last moved on
     """
 
-    def __init__(self, x, y, size):
+    __slots__ = ('etype', 'rng', 'dirchangefreq', 'lodphase', 'lodinterval',
+                 'lastmove')
+
+    def __init__(self, x, y, size, rng=random, dirchangefreq=DIRCHANGEFREQ):
         """Make a Fish with a random starting velocity"""
-        super(EnemyFish, self).__init__(L_FISH_IMG, R_FISH_IMG, x, y, size)
-        self.vx, self.vy = self.__getRandomVelocity()
+        self.rng = rng
+        self.dirchangefreq = dirchangefreq
         self.etype = 'fish'
+        super(EnemyFish, self).__init__(FISH_SPRITE, x, y, size)
+
+    def place(self, x, y, size):
+        """Puts the fish at x, y with a new size and random velocity"""
+        super(EnemyFish, self).place(x, y, size)
+        self.vx, self.vy = self.__getRandomVelocity()
 
     def __getRandomVelocity(self):
         """Returns a random velocity with x and y components"""
-        vx = random.randint(MINSPEED, MAXSPEED)
-        vy = random.randint(MINSPEED, MAXSPEED)
-        if random.randint(0, 1) == 0:
+        vx = self.rng.randint(MINSPEED, MAXSPEED)
+        vy = self.rng.randint(MINSPEED, MAXSPEED)
+        if self.rng.randint(0, 1) == 0:
             vx *= -1
-        if random.randint(0, 1) == 0:
+        if self.rng.randint(0, 1) == 0:
             vy *= -1
         return vx, vy
 
-    def move(self):
-        """Move EnemyFish after random chance of shifting velocity"""
+    def move(self, steps=1):
+        """Move EnemyFish after random chance of shifting velocity
+
+        steps moves it that many frames' worth at once, with the chance
+        of changing direction scaled to match
+        """
         # random chance they change direction if a fish
-        if self.etype == 'fish' and random.randint(0, 99) < DIRCHANGEFREQ:
+        if (self.etype == 'fish' and
+                self.rng.randint(0, 99) < self.dirchangefreq * steps):
             self.vx, self.vy = self.__getRandomVelocity()
 
-        super(EnemyFish, self).move()
-        # flip the image if necessary
-        if self.vx > 0:
-            self.image = pygame.transform.scale(self.R_image,
-                                                (self.size, self.size))
-        else:
-            self.image = pygame.transform.scale(self.L_image,
-                                                (self.size, self.size))
+        super(EnemyFish, self).move(steps)
+        # face the direction of travel
+        self.facing = 'right' if self.vx > 0 else 'left'
 
 
 class Shark(EnemyFish):
     """Fish that moves towards player
 
     Attributes(* denotes not part of parent EnemyFish class):
-        L_image, R_image:   Left, Right facing images of Fish
-        image:              The current fish image that will be drawn
+        sprite:             Left, Right facing images of Fish
+        facing:             Left or right, picks which image is drawn
         size:               Sidelength size of square fish
         x, y:               Absolute position of the fish
+        lastx, lasty:       Position before the fish last moved
         vx, vy:             Velocity components of the fish
         colrect:            A rectangle to check for collisions
-        camrect:            A rectangle near the camera for drawing
         etype:              Enemy type used for tracking in game file
         *player:            The player fish to move towards
+        *speed:             Speed the shark moves towards the player
 
-    TO DO:
-        Add a shark collision group so that they don't stack if multiple
+    Additional Methods:
+        separate(Shark):    pushes two overlapping sharks apart
     """
 
-    def __init__(self, x, y, size, player):
-        # Setup with correct image (using Fish constructor)
-        super(EnemyFish, self).__init__(L_SHARK_IMG, R_SHARK_IMG,
-                                        x, y, size)
+    __slots__ = ('player', 'speed')
+
+    def __init__(self, x, y, size, player, speed=SHARKSPEED):
         # Shark has a player to track
         self.player = player
+        self.speed = speed
         self.etype = 'shark'
+        # Setup with correct image (using Fish constructor)
+        super(EnemyFish, self).__init__(SHARK_SPRITE, x, y, size)
 
-    def move(self):
+    def place(self, x, y, size):
+        """Puts the shark at x, y with a new size, at rest"""
+        Fish.place(self, x, y, size)
+
+    def move(self, steps=1):
         """Move Shark towards the player center"""
         # difference between player and shark centers
         xdiff = ((self.player.x + self.player.size / 2) -
@@ -276,14 +305,94 @@ class Shark(EnemyFish):
         ydiff = ((self.player.y + self.player.size / 2) -
                  (self.y + self.size / 2))
 
-        if abs(xdiff) < SHARKSPEED:
+        if abs(xdiff) < self.speed:
             self.vx = xdiff
         else:
-            self.vx = SHARKSPEED * math.copysign(1, xdiff)
+            self.vx = self.speed * math.copysign(1, xdiff)
 
-        if abs(ydiff) < SHARKSPEED:
+        if abs(ydiff) < self.speed:
             self.vy = ydiff
         else:
-            self.vy = SHARKSPEED * math.copysign(1, ydiff)
+            self.vy = self.speed * math.copysign(1, ydiff)
+
+        super(Shark, self).move(steps)
+
+    def separate(self, other):
+        """Push this shark and other apart so they don't stack"""
+        overlap = self.colrect.clip(other.colrect)
+        # split the overlap along the axis that needs the smaller push
+        if overlap.width < overlap.height:
+            shift = overlap.width / 2
+            if self.colrect.centerx < other.colrect.centerx:
+                shift *= -1
+            self.x += shift
+            other.x -= shift
+        else:
+            shift = overlap.height / 2
+            if self.colrect.centery < other.colrect.centery:
+                shift *= -1
+            self.y += shift
+            other.y -= shift
+        self.colrect.update(self.x, self.y, self.size, self.size)
+        other.colrect.update(other.x, other.y, other.size, other.size)
+
+
+class FishPool(object):
+    """Recycles removed EnemyFish and Sharks for new spawns
+
+    Reusing a culled or eaten enemy avoids building a new object (and
+    its rects) for every spawn and keeps the garbage collector quiet
+    when many fish come and go.
+
+    Attributes:
+        maxsize:            Most enemies of each type kept for reuse
+        dirChangeFreq:      dirchangefreq of the EnemyFish it builds
+        sharkSpeed:         speed of the Sharks it builds
+        created, reused:    Counts of enemies built new and recycled
+
+    Key Methods:
+        fish:       Returns an EnemyFish, recycled if possible
+        shark:      Returns a Shark, recycled if possible
+        release:    Takes back an enemy removed from the game
+    """
 
-        super(Shark, self).move()
+    def __init__(self, maxsize=MAXPOOLSIZE, dirChangeFreq=DIRCHANGEFREQ,
+                 sharkSpeed=SHARKSPEED):
+        self.maxsize = maxsize
+        self.dirChangeFreq = dirChangeFreq
+        self.sharkSpeed = sharkSpeed
+        self.created, self.reused = 0, 0
+        self._free = {'fish': [], 'shark': []}
+
+    def __len__(self):
+        return len(self._free['fish']) + len(self._free['shark'])
+
+    def fish(self, x, y, size, rng=random):
+        """Returns an EnemyFish at x, y with a random velocity"""
+        free = self._free['fish']
+        if not free:
+            self.created += 1
+            return EnemyFish(x, y, size, rng, self.dirChangeFreq)
+        self.reused += 1
+        enemy = free.pop()
+        enemy.rng = rng
+        enemy.place(x, y, size)
+        return enemy
+
+    def shark(self, x, y, size, player):
+        """Returns a Shark at x, y that moves towards player"""
+        free = self._free['shark']
+        if not free:
+            self.created += 1
+            return Shark(x, y, size, player, self.sharkSpeed)
+        self.reused += 1
+        enemy = free.pop()
+        enemy.player = player
+        enemy.place(x, y, size)
+        return enemy
+
+    def release(self, enemy):
+        """Keeps an enemy that left the game for reuse"""
+        free = self._free[enemy.etype]
+        if len(free) < self.maxsize:
+            free.append(enemy)
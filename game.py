@@ -1,8 +1,21 @@
 #!/usr/bin/env python
+import atexit
+import math
 import random
+import sys
 import time
 import pygame
-from fish import Player, EnemyFish, Shark
+from pygame.locals import QUIT, KEYDOWN, K_F3, K_BACKSPACE
+from chunks import ChunkStreamer
+from fish import Player, FishPool, DIRCHANGEFREQ, SHARKSPEED
+from lod import gapOutside, updateInterval
+from pipeline import EventQueue, SimulationThread
+from profiler import FrameProfiler, NULLTIMER, PHASES
+from replay import Replay, loadReplay
+from savestate import RewindBuffer
+from school import School
+from spatial import SpatialHash
+from sprites import SPRITES, blitBySize, convertSprites, imagePath
 
 # Set Game Constants
 WINDOW_WIDTH = 640   # width of the program's window, in pixels
@@ -15,43 +28,140 @@ WATER_COLOR = (0, 141, 199)
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
 
-FPS = 30            # frames per second to update the screen
+FPS = 30            # ticks per second the game is simulated at
 TEXTTIME = 2        # how long text messages appear for in s
 
+# simulate FPS ticks per second however fast frames are drawn, drawing
+# the fish and camera between ticks, instead of one tick per frame
+FIXEDSTEP = True
+RENDERFPS = 60      # most frames drawn per second with FIXEDSTEP,
+#                     0 to draw as fast as possible (uses a whole core)
+MAXCATCHUP = 5      # most ticks run before a frame when drawing lags,
+#                     the game slows down rather than falling further behind
+# step the World on a worker thread while the main thread draws the
+# ticks before (see pipeline.py)
+PIPELINE = False
+
 # tweak the difficulty
 INVULNTIME = 2       # how long the Player is invulnerable after being hit in s
 WINSIZE = 275        # how big the Player needs to be to win
 NUMENEMYFISH = 30    # number of EnemyFish in the active area
 NUMSHARKS = 1        # number of Sharks in the active area
 
+# how enemies are stored and simulated
+#   'objects': an EnemyFish/Shark object per enemy
+#   'numpy':   batched NumPy arrays (School), needs NumPy installed
+BACKEND = 'objects'
+
+# stream EnemyFish in and out with the chunks of ocean around the camera
+# (see chunks.py) instead of keeping NUMENEMYFISH in the active area
+STREAMCHUNKS = False
+
+# move EnemyFish far outside the camera view only every few frames
+# (see lod.py), visible fish and Sharks still move every frame
+LODUPDATES = False
+
+# zoom the camera out as the player grows so big fish still fit; the
+# ocean is drawn into a ZOOMBUFFER sized surface that is scaled to the
+# window in one pass, rather than scaling every fish to the zoom
+ZOOM = False
+ZOOMSIZE = 100       # biggest the player is drawn before zooming out
+ZOOMLEVELS = 4       # zooms per halving, fewer reuse more scaled sprites
+ZOOMBUFFER = (480, 360)  # resolution the zoomed ocean is drawn at, same
+#                          shape as the window
+ZOOMSURF = None      # surface the zoomed ocean is drawn into, made when
+#                      first needed
+
+# performance HUD (toggled with HUDKEY) and frame history
+HUDKEY = K_F3        # key that shows/hides the performance HUD
+HUDCOLOR = (255, 255, 0)
+PROFILEDUMP = None   # file the frame history is written to on exit
+#                      (.csv or .json), None to not write it
+
+DIRTYRECTS = False   # only erase/update the screen areas that changed
+PIXELCOLLIDE = False  # fish only touch where their opaque pixels overlap,
+#                       not anywhere in their squares
+
+# replays (see replay.py)
+RECORDREPLAY = None  # file every game's key presses are saved to on exit,
+#                      None to not record them
+PLAYREPLAY = None    # replay file to play back instead of reading keys
+# hold REWINDKEY to play the last REWINDTIME seconds backwards (see
+# savestate.py), not while a replay is recorded or played, with PIPELINE
+# or with STREAMCHUNKS (their worlds can't be saved)
+REWINDTIME = 0       # seconds of play kept to rewind through, 0 for off
+REWINDKEY = K_BACKSPACE
+
+# settings saved with a replay and restored to play it back
+# (every Settings default among them)
+REPLAYSETTINGS = ('BACKEND', 'NUMENEMYFISH', 'NUMSHARKS', 'WINSIZE',
+                  'INVULNTIME', 'SHARKSPEED', 'DIRCHANGEFREQ', 'STREAMCHUNKS',
+                  'LODUPDATES', 'PIXELCOLLIDE', 'ZOOM')
+
 
 def main():
     """Initializes main game variables and starts game"""
-    global FPSCLOCK, SCREEN, BASICFONT
+    global FPSCLOCK, SCREEN, BASICFONT, HUDFONT, PROFILER, EVENTS, KEYBOARD
+    global UPDATER
     # set up the game window
     pygame.init()
     FPSCLOCK = pygame.time.Clock()
-    pygame.display.set_icon(pygame.image.load('.\img\gameicon.png'))
+    pygame.display.set_icon(pygame.image.load(imagePath('gameicon.png')))
     SCREEN = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    convertSprites()  # blit sprites in the display's pixel format
     pygame.display.set_caption('Fishy')
     BASICFONT = pygame.font.Font('freesansbold.ttf', 32)
+    HUDFONT = pygame.font.Font('freesansbold.ttf', 12)
+
+    # time every frame, the history outlives each game. Its target is
+    # the frame rate rather than the tick rate, so averages() covers
+    # the last second (guessing FPS when frames aren't limited)
+    PROFILER = FrameProfiler(getFrameRate() or FPS)
+    # with PIPELINE the main thread reads the events for the worker
+    EVENTS = EventQueue() if PIPELINE else pygame.event
+    KEYBOARD = KeyboardInput(EVENTS)
+    UPDATER = ScreenUpdater(DIRTYRECTS)
+    if PROFILEDUMP:
+        atexit.register(PROFILER.dump, PROFILEDUMP)
+
+    if PLAYREPLAY:
+        # play every recorded game once, then quit
+        replay = loadReplay(PLAYREPLAY)
+        useSettings(replay.settings)
+        for i, game in enumerate(replay.games):
+            runGame(game['seed'], replay.play(i, KEYBOARD))
+        return
+
+    replay = None
+    if RECORDREPLAY:
+        replay = Replay(getSettings())
+        atexit.register(replay.save, RECORDREPLAY)
 
     # start the game
     while True:
-        runGame()
+        seed = random.getrandbits(32)
+        if replay is None:
+            runGame(seed, KEYBOARD)
+        else:
+            runGame(seed, replay.record(seed, KEYBOARD))
+
+
+def getSettings():
+    """Returns the REPLAYSETTINGS as a dict"""
+    return dict((name, globals()[name]) for name in REPLAYSETTINGS)
 
 
-def runGame():
-    """Starts a new game"""
-    # set up variables for the start of a new game
-    invulnerableMode = False   # if the player is invulnerable
-    invulnerableStartTime = 0  # time the player became invulnerable
-    gameOverMode = False       # if the player has lost
-    gameOverStartTime = 0      # time the player lost used to restart game
-    winMode = False            # if player has won
-    winStartTime = 0           # time the player won used to restart game
-    startTime = time.time()    # time game starts used to display instructions
+def useSettings(settings):
+    """Sets the REPLAYSETTINGS found in the dict settings"""
+    for name in REPLAYSETTINGS:
+        if name in settings:
+            globals()[name] = settings[name]
 
+
+def runGame(seed=None, inputs=None):
+    """Starts a new game from seed, with the player's events coming
+    from inputs (the keyboard by default)
+    """
     # create the surfaces to hold game text
     howToSurf = BASICFONT.render(
         'Use arrows to move', True, WHITE)
@@ -72,111 +182,533 @@ def runGame():
     winRect = winSurf.get_rect()
     winRect.center = (HALF_WINDOW_WIDTH, HALF_WINDOW_HEIGHT)
 
-    # initialize player, camera, and enemy information
-    player = Player(HALF_WINDOW_WIDTH, HALF_WINDOW_HEIGHT)
-    camera = Camera()   # handles visible area
-    enemies = []        # stores all the non-player fish
-    num_enemyfish = 0   # how many EnemyFish are currently active
-    num_sharks = 0      # how many Sharks are currently active
-
-    while True:  # main game loop
-        # add background, healthbar, enemies, and player to the screen
-        SCREEN.fill(WATER_COLOR)
-        drawHealthMeter(player.health)
-        for enemy in enemies:
-            enemy.draw(SCREEN, camera)
-        flashIsOn = round(time.time(), 1) * 10 % 2 == 1
-        if not gameOverMode and not (invulnerableMode and flashIsOn):
-            player.draw(SCREEN, camera)
-
-        # add more enemies if we don't have enough.
-        while num_enemyfish < NUMENEMYFISH:
-            size = random.randint(int(player.size - 2 * player.size ** 0.5),
-                                  int(player.size + player.size ** 0.5))
-            x, y = camera.getRandomOffCameraPos(size)
-            enemies.append(EnemyFish(x, y, size))
-            num_enemyfish += 1
-        while num_sharks < NUMSHARKS:
-            size = player.size + 75
-            x, y = camera.getRandomOffCameraPos(size)
-            enemies.append(Shark(x, y, size, player))
-            num_sharks += 1
-
-        # If the game just started show the instructions
-        if time.time() - TEXTTIME < startTime:
-            SCREEN.blit(howToSurf, howToRect)
-            SCREEN.blit(howToSurf2, howToRect2)
-        # If the player won show win text
-        elif winMode:
-            SCREEN.blit(winSurf, winRect)
-            if time.time() - winStartTime > TEXTTIME:
-                return  # restart game after waiting TEXTTIME
-
-        # otherwise continue the game
-        elif not gameOverMode:
-            # Check if we should turn off invulnerability
-            if (invulnerableMode and
-                    time.time() - invulnerableStartTime > INVULNTIME):
-                invulnerableMode = False
-
-            player.move()  # move the player
-            camera.adjust(player)  # adjust camera to follow player
-
-            # loop through enemies list backwards because some may get deleted
-            for i in range(len(enemies) - 1, -1, -1):
-                enemy = enemies[i]
-                enemy.move()  # move each enemy
-
-                # Remove enemies far from the visible area
-                if camera.isOutsideActiveArea(enemy):
-                    del enemies[i]
-                    num_enemyfish, num_sharks = updateEnemyCts(num_enemyfish,
-                                                               num_sharks,
-                                                               enemy)
-                    continue
-
-                # check if the player has collided with an enemy
-                if player.colrect.colliderect(enemy.colrect):
-                    # player eats smaller fish
-                    if enemy.size < player.size:
-                        player.eat(enemy)  # grow the player
-                        del enemies[i]     # remove eaten fish
-                        num_enemyfish, num_sharks = updateEnemyCts(num_enemyfish,
-                                                                   num_sharks,
-                                                                   enemy)
-                        # check if won
-                        if player.size > WINSIZE:
-                            winMode = True
-                            winStartTime = time.time()
-
-                    # otherwise player is smaller and takes damage
-                    # if they are not invulnerable
-                    elif not invulnerableMode:
-                        invulnerableMode = True
-                        invulnerableStartTime = time.time()
-                        player.health -= 1
-                        if player.health == 0:
-                            gameOverMode = True  # turn on "game over mode"
-                            gameOverStartTime = time.time()
+    # initialize player, camera, enemy and timer information
+    world = World(seed, KEYBOARD if inputs is None else inputs,
+                  timer=PROFILER)
+    clock = TickClock(FPS) if FIXEDSTEP else None
+    sim = SimulationThread(world) if PIPELINE else None
+    rewind = None
+    if (REWINDTIME and sim is None and world.inputs is KEYBOARD and
+            world.chunks is None):
+        rewind = RewindBuffer(REWINDTIME * FPS)
+
+    quitting = False
+    try:
+        while True:  # main game loop
+            # advance the game as many ticks as are due
+            ticks, alpha = (1, 1.0) if clock is None else clock.advance()
+            if sim is None:
+                rewinding = rewind is not None and KEYBOARD.isHeld(REWINDKEY)
+                for _ in range(ticks):
+                    if rewinding:
+                        rewind.back(world)  # go back a tick instead
+                        continue
+                    world.step()
+                    if world.done:
+                        return  # restart game after the end text was shown
+                    if rewind is not None:
+                        rewind.record(world)
+                scene = world
+            else:
+                # the worker steps the World while the ticks before are
+                # drawn from their snapshot
+                events = pygame.event.get()
+                if any(event.type == QUIT for event in events):
+                    # the worker must never see QUIT, Player.move would
+                    # shut pygame down under the drawing thread
+                    quitting = True
+                    return
+                EVENTS.put(events)
+                sim.start(ticks)
+                scene = sim.snapshot
+
+            with PROFILER.phase('draw'):
+                # add background, healthbar, enemies, and player to the
+                # screen
+                UPDATER.erase(scene.camera)
+                if sim is None:
+                    drawn = drawWorld(world, alpha)
+                else:
+                    drawn = drawSnapshot(scene, alpha)
+                if KEYBOARD.showHUD:
+                    drawn += drawPerfHUD(PROFILER)
+
+                # If the game just started show the instructions
+                if scene.showingInstructions():
+                    drawn.append(SCREEN.blit(howToSurf, howToRect))
+                    drawn.append(SCREEN.blit(howToSurf2, howToRect2))
+                # If the player won show win text
+                elif scene.winMode:
+                    drawn.append(SCREEN.blit(winSurf, winRect))
+                # If the player lost show "game over" text
+                elif scene.gameOverMode:
+                    drawn.append(SCREEN.blit(gameOverSurf, gameOverRect))
+
+                # update display and clock
+                UPDATER.update(drawn)
+
+            if sim is not None:
+                sim.wait()
+                if world.done:
+                    return  # restart game after the end text was shown
+            PROFILER.endFrame(world.enemies.numFish,
+                              world.enemies.numSharks)
+            FPSCLOCK.tick(getFrameRate())
+    finally:
+        if sim is not None:
+            sim.stop()
+        if quitting:
+            terminate()  # only once the worker has stopped
+
+
+def terminate():
+    """Closes the window and exits, like Player.move does on QUIT"""
+    pygame.display.quit()
+    pygame.quit()
+    sys.exit()
+
+
+class TickClock(object):
+    """Says how many fixed-length ticks to simulate before each frame
+
+    Real time passing is added up, and whole ticks are taken out of it
+    as they are simulated. What is left over, as a fraction of a tick,
+    is how far between the last two ticks the frame is drawn. When
+    drawing falls behind by more than maxCatchUp ticks the extra time
+    is dropped.
+
+    Attributes:
+        rate:           Ticks per second
+        maxCatchUp:     Most ticks run before one frame
+        accumulator:    Seconds passed that haven't been simulated yet
+        clock:          Function returning the time in seconds
+
+    Key Methods:
+        advance:    Returns the ticks due and how far into the next
+                    tick the frame is
+    """
+
+    def __init__(self, rate, maxCatchUp=MAXCATCHUP, clock=time.perf_counter):
+        if rate <= 0 or maxCatchUp <= 0:
+            raise ValueError('rate and maxCatchUp must be positive')
+        self.rate = rate
+        self.maxCatchUp = maxCatchUp
+        self.clock = clock
+        self.accumulator = 0.0
+        self._lastTime = None
+
+    def advance(self):
+        """Returns (ticks, alpha): the ticks to simulate now and the
+        fraction of a tick (0 to 1) passed since the last of them
+        """
+        now = self.clock()
+        if self._lastTime is not None:
+            self.accumulator += now - self._lastTime
+        self._lastTime = now
+
+        step = 1.0 / self.rate
+        ticks = min(int(self.accumulator / step), self.maxCatchUp)
+        self.accumulator -= ticks * step
+        if self.accumulator >= step:
+            # too far behind to catch up, drop the whole ticks left over
+            self.accumulator = math.fmod(self.accumulator, step)
+        return ticks, min(self.accumulator / step, 1.0)
+
+
+class ScreenUpdater(object):
+    """Erases the screen before a frame is drawn and shows it after
+
+    With dirtyRects on, only the areas drawn on this frame or the last
+    one are erased and passed to display.update. When the camera moves
+    everything on screen moves, so the whole screen is redrawn.
+
+    Attributes:
+        dirtyRects: If only the changed areas are erased and updated
+        lastRects:  Areas of the screen drawn on last frame
+        lastCamera: Camera position last frame
+        full:       If the whole screen is redrawn this frame
+
+    Key Methods:
+        erase:  Paints water over what needs redrawing
+        update: Shows the frame, given the areas drawn on it
+    """
+
+    def __init__(self, dirtyRects=True):
+        self.dirtyRects = dirtyRects
+        self.lastRects = []
+        self.lastCamera = None
+        self.full = True
+
+    def erase(self, camera):
+        """Paints water over last frame's drawings, or the whole screen
+        if the camera moved
+        """
+        position = (camera.x, camera.y)
+        self.full = not self.dirtyRects or position != self.lastCamera
+        self.lastCamera = position
+        if self.full:
+            SCREEN.fill(WATER_COLOR)
+        else:
+            for rect in self.lastRects:
+                SCREEN.fill(WATER_COLOR, rect)
+
+    def update(self, drawn):
+        """Updates the display where this frame or the last drew"""
+        if self.full:
+            pygame.display.update()
+        else:
+            pygame.display.update(self.lastRects + drawn)
+        self.lastRects = drawn
+
+
+class KeyboardInput(object):
+    """Input source reading pygame's event queue for a World
+
+    Keys meant for the game window rather than the player are handled
+    here and not passed on.
+
+    Attributes:
+        events:     Where events are read from, pygame.event or an
+                    EventQueue
+        showHUD:    If the performance HUD is shown, toggled by HUDKEY
+    """
+
+    def __init__(self, events=pygame.event):
+        self.events = events
+        self.showHUD = False
+
+    def isHeld(self, key):
+        """Returns if key is held down, leaving the events queued"""
+        pygame.event.pump()
+        return pygame.key.get_pressed()[key]
+
+    def get(self):
+        """Returns the events for the player"""
+        events = []
+        for event in self.events.get():
+            if event.type == KEYDOWN and event.key == HUDKEY:
+                self.showHUD = not self.showHUD
+            else:
+                events.append(event)
+        return events
+
+
+class Settings(object):
+    """Difficulty settings of one World
+
+    Settings not given are read from the module constants when the
+    Settings are made, so every game can be tuned on its own.
+
+    Attributes:
+        numEnemyFish:   EnemyFish kept in the active area (NUMENEMYFISH)
+        numSharks:      Sharks kept in the active area (NUMSHARKS)
+        winSize:        How big the Player needs to be to win (WINSIZE)
+        invulnTime:     Seconds the Player is invulnerable after a hit
+                        (INVULNTIME)
+        sharkSpeed:     Speed Sharks move towards the Player
+                        (fish.SHARKSPEED)
+        dirChangeFreq:  % chance per frame an EnemyFish changes direction
+                        (fish.DIRCHANGEFREQ)
+    """
+
+    def __init__(self, numEnemyFish=None, numSharks=None, winSize=None,
+                 invulnTime=None, sharkSpeed=None, dirChangeFreq=None):
+        def pick(value, default):
+            return default if value is None else value
+        self.numEnemyFish = pick(numEnemyFish, NUMENEMYFISH)
+        self.numSharks = pick(numSharks, NUMSHARKS)
+        self.winSize = pick(winSize, WINSIZE)
+        self.invulnTime = pick(invulnTime, INVULNTIME)
+        self.sharkSpeed = pick(sharkSpeed, SHARKSPEED)
+        self.dirChangeFreq = pick(dirChangeFreq, DIRCHANGEFREQ)
+        if (self.numEnemyFish < 0 or self.numSharks < 0 or
+                self.invulnTime < 0):
+            raise ValueError('enemy counts and invulnTime must not be '
+                             'negative')
+        if (self.winSize <= 0 or self.sharkSpeed <= 0 or
+                self.dirChangeFreq <= 0):
+            raise ValueError('winSize, sharkSpeed and dirChangeFreq must '
+                             'be positive')
+
+    def __repr__(self):
+        return ('Settings(numEnemyFish=%r, numSharks=%r, winSize=%r, '
+                'invulnTime=%r, sharkSpeed=%r, dirChangeFreq=%r)' %
+                (self.numEnemyFish, self.numSharks, self.winSize,
+                 self.invulnTime, self.sharkSpeed, self.dirChangeFreq))
+
+
+class World(object):
+    """The state of one game, advanced a fixed tick at a time
+
+    Nothing here draws or reads the clock, time is counted in ticks of
+    1 / FPS seconds. Given the same seed and the same inputs a World
+    steps through exactly the same states, with or without a window.
+
+    Attributes:
+        player, camera:     The Player and the Camera following it
+        enemies:            EnemyGroup or School holding the enemies
+        chunks:             ChunkStreamer supplying the EnemyFish, or
+                            None to keep NUMENEMYFISH of them
+        settings:           Settings the game is played with
+        rng:                random.Random used for spawning and enemies
+        inputs:             Event source with a get() method returning
+                            the keyboard events for one tick
+        timer:              PhaseTimer timing the spawn, move, cull
+                            and collide phases (NULLTIMER by default)
+        tick:               Ticks since the game started
+        invulnerableMode:   If the player is invulnerable
+        gameOverMode:       If the player has lost
+        winMode:            If the player has won
+        *StartTick:         Tick the matching mode started on
+        moved:              If the last step moved the fish and camera
+        done:               True once the game should restart, or
+                            once inputs has no more events (its
+                            finished attribute is set)
+
+    Key Methods:
+        step:               Advances the game one tick
+        showingInstructions: Returns if the instructions are up
+        flashIsOn:          Returns if an invulnerable player is hidden
+    """
+
+    def __init__(self, seed=None, inputs=None, backend=None, timer=None,
+                 settings=None):
+        self.settings = Settings() if settings is None else settings
+        self.rng = random.Random(seed)
+        self.timer = NULLTIMER if timer is None else timer
+        self.inputs = pygame.event if inputs is None else inputs
+        self.player = Player(HALF_WINDOW_WIDTH, HALF_WINDOW_HEIGHT)
+        self.camera = Camera()
+        self.enemies = makeEnemies(self.rng, backend, self.settings)
+        self.chunks = None
+        if STREAMCHUNKS:
+            self.chunks = ChunkStreamer(self.rng.getrandbits(32))
+        self.tick = 0
+        self.invulnerableMode = False
+        self.invulnerableStartTick = 0
+        self.gameOverMode = False
+        self.gameOverStartTick = 0
+        self.winMode = False
+        self.winStartTick = 0
+        self.moved = False
+        self.done = False
+
+    def showingInstructions(self):
+        """Returns if the game just started and shows the instructions"""
+        return self.tick < TEXTTIME * FPS
+
+    def flashIsOn(self):
+        """Returns if an invulnerable player is hidden this tick,
+        flashing ten times a second
+        """
+        return self.tick * 10 // FPS % 2 == 1
+
+    def step(self):
+        """Advances the game one tick"""
+        self.moved = False
+        with self.timer.phase('spawn'):
+            self.spawn()
+
+        # the game is paused while the instructions show
+        if self.showingInstructions():
+            pass
+        elif self.winMode:
+            if self.tick - self.winStartTick > TEXTTIME * FPS:
+                self.done = True  # restart game after waiting TEXTTIME
+        elif not self.gameOverMode:
+            self.update()
+        elif self.tick - self.gameOverStartTick > TEXTTIME * FPS:
+            self.done = True  # restart game after waiting TEXTTIME
+
+        # a replay ran out of recorded events
+        if getattr(self.inputs, 'finished', False):
+            self.done = True
+
+        self.tick += 1
+
+    def spawn(self):
+        """Adds more enemies if we don't have enough"""
+        player, camera, enemies = self.player, self.camera, self.enemies
+        if self.chunks is not None:
+            # EnemyFish come with the chunks as they load
+            self.timer.count('spawns',
+                             self.chunks.load(enemies, camera, player))
+            missing = 0
         else:
-            # game is over, show "game over" text
-            SCREEN.blit(gameOverSurf, gameOverRect)
-            if time.time() - gameOverStartTime > TEXTTIME:
-                return  # restart game after waiting TEXTTIME
+            missing = self.settings.numEnemyFish - enemies.numFish
+        if missing > 0:
+            # refill every missing fish in one batch, sorted by size so
+            # fish the same size share their spawn regions
+            low = int(player.size - 2 * player.size ** 0.5)
+            high = int(player.size + player.size ** 0.5)
+            sizes = sorted(self.rng.randint(low, high)
+                           for _ in range(missing))
+            positions = camera.getRandomOffCameraPositions(sizes, self.rng)
+            enemies.spawnFishBatch(positions, sizes)
+            self.timer.count('spawns', missing)
+        while enemies.numSharks < self.settings.numSharks:
+            size = player.size + 75
+            x, y = camera.getRandomOffCameraPos(size, self.rng)
+            enemies.spawnShark(x, y, size, player)
+            self.timer.count('spawns')
+
+    def update(self):
+        """Moves everything and settles collisions with the player"""
+        # Check if we should turn off invulnerability
+        if (self.invulnerableMode and
+                self.tick - self.invulnerableStartTick >
+                self.settings.invulnTime * FPS):
+            self.invulnerableMode = False
+
+        self.moved = True
+        with self.timer.phase('move'):
+            self.player.move(self.inputs.get())  # move the player
+            self.camera.adjust(self.player)  # adjust camera to follow player
+            # move each enemy
+            self.enemies.move(self.camera.getView() if LODUPDATES else None)
+        with self.timer.phase('cull'):
+            # remove enemies far from view
+            if self.chunks is not None:
+                # EnemyFish are frozen into their chunk instead
+                self.timer.count('culls', self.chunks.freeze(self.enemies))
+                culled = self.enemies.cull(self.camera, 'shark')
+            else:
+                culled = self.enemies.cull(self.camera)
+            self.timer.count('culls', culled)
+        with self.timer.phase('collide'):
+            self.collide()
+
+    def collide(self):
+        """Lets the player eat or be hurt by the enemies it touches"""
+        player = self.player
+        for enemy in self.enemies.collide(player, PIXELCOLLIDE):
+            # player eats smaller fish
+            if enemy.size < player.size:
+                player.eat(enemy)  # grow the player
+                self.enemies.remove(enemy)  # remove eaten fish
+                # check if won
+                if player.size > self.settings.winSize:
+                    self.winMode = True
+                    self.winStartTick = self.tick
+
+            # otherwise player is smaller and takes damage
+            # if they are not invulnerable
+            elif not self.invulnerableMode:
+                self.invulnerableMode = True
+                self.invulnerableStartTick = self.tick
+                player.health -= 1
+                if player.health == 0:
+                    self.gameOverMode = True  # turn on "game over mode"
+                    self.gameOverStartTick = self.tick
+
 
-        # update display and clock
-        pygame.display.update()
-        FPSCLOCK.tick(FPS)
+def drawWorld(world, alpha=1.0):
+    """Draws the health meter, enemies and player over the background,
+    returns the areas of the screen drawn on
+
+    alpha below 1 draws the fish and camera that far between the last
+    tick (1) and the one before it (0)
+    """
+    if not world.moved:
+        alpha = 1.0  # nothing moved, there is nothing to draw between
+    # at zoom 1 the fish are drawn straight to the screen, unscaled
+    if ZOOM and world.camera.zoom != 1:
+        player = world.player
+        fish = world.enemies.getDrawState()
+        if not world.gameOverMode and not (world.invulnerableMode and
+                                           world.flashIsOn()):
+            fish.append((player.sprite, player.x, player.y, player.lastx,
+                         player.lasty, player.size, player.facing))
+        return drawZoomed(fish, world.camera, player.health, alpha)
+    drawn = [drawHealthMeter(world.player.health)]
+    # one draw list so the player is layered by size with the enemies
+    fish = world.enemies.getDrawList(world.camera, alpha)
+    if not world.gameOverMode and not (world.invulnerableMode and
+                                       world.flashIsOn()):
+        camerax, cameray = world.camera.getPosition(alpha)
+        fish.append(world.player.getDrawItem(camerax, cameray, 1 - alpha))
+    return drawn + blitBySize(SCREEN, fish)
+
+
+def drawSnapshot(snapshot, alpha=1.0):
+    """drawWorld for a pipeline.Snapshot"""
+    if not snapshot.moved:
+        alpha = 1.0
+    fish = snapshot.enemies
+    if snapshot.player is not None:
+        fish = fish + [snapshot.player]
+    if ZOOM and snapshot.camera.zoom != 1:
+        return drawZoomed(fish, snapshot.camera, snapshot.health, alpha)
+    back = 1 - alpha
+    camerax, cameray = snapshot.camera.getPosition(alpha)
+    drawn = [drawHealthMeter(snapshot.health)]
+    # truncate toward zero like Fish.getDrawItem
+    return drawn + blitBySize(SCREEN, [
+        (size, sprite, facing, int(x - (x - lastx) * back - camerax),
+         int(y - (y - lasty) * back - cameray))
+        for sprite, x, y, lastx, lasty, size, facing in fish])
+
+
+def drawZoomed(fish, camera, health, alpha=1.0):
+    """Draws fish, given as (sprite, x, y, lastx, lasty, size, facing),
+    into ZOOMSURF at the camera's zoom and scales that over the whole
+    screen, then adds the health meter, returns the areas drawn on
+
+    Fish are drawn with the cached sprites for their size in the buffer,
+    which only takes a few values per size since the zoom is stepped.
+    """
+    global ZOOMSURF
+    if ZOOMSURF is None:
+        ZOOMSURF = pygame.Surface(ZOOMBUFFER).convert()
+    back = 1 - alpha
+    camerax, cameray = camera.getPosition(alpha)
+    scale = ZOOMSURF.get_width() * camera.zoom / WINDOW_WIDTH
+    ZOOMSURF.fill(WATER_COLOR)
+    blitBySize(ZOOMSURF, [
+        (max(int(size * scale), 1), sprite, facing,
+         int((x - (x - lastx) * back - camerax) * scale),
+         int((y - (y - lasty) * back - cameray) * scale))
+        for sprite, x, y, lastx, lasty, size, facing in fish])
+    pygame.transform.scale(ZOOMSURF, SCREEN.get_size(), SCREEN)
+    return [SCREEN.get_rect(), drawHealthMeter(health)]
 
 
 def drawHealthMeter(currentHealth):
-    """Adds the health meter to the display"""
+    """Adds the health meter to the display, returns its area"""
     for i in range(currentHealth):  # draw red health bars
         pygame.draw.rect(SCREEN, RED,
                          (15, 35 - i * 10, 20, 10))
     for i in range(3):  # draw the white outlines
         pygame.draw.rect(SCREEN, WHITE,
                          (15, 35 - i * 10, 20, 10), 1)
+    return pygame.Rect(15, 15, 20, 30)
+
+
+def getFrameRate():
+    """Returns the most frames drawn per second, 0 for no limit"""
+    return RENDERFPS if FIXEDSTEP else FPS
+
+
+def drawPerfHUD(profiler):
+    """Adds the frame times, FPS, enemy counts and spawn/cull rates
+    of the last second to the display, right of the health meter,
+    returns the areas of the screen drawn on
+    """
+    stats = profiler.averages()
+    if stats is None:
+        return []
+    latest = profiler.history()[-1]
+    target = getFrameRate()
+    lines = [
+        'frame %.1f ms  fps %.1f / %s' % (stats['frame_ms'], stats['fps'],
+                                          target if target else 'no limit'),
+        '  '.join('%s %.2f' % (name, stats[name + '_ms'])
+                  for name in PHASES) + ' ms',
+        'fish %d  sharks %d' % (latest['fish'], latest['sharks']),
+        'spawns %.1f/s  culls %.1f/s' % (stats['spawns'], stats['culls'])]
+    return [SCREEN.blit(HUDFONT.render(line, True, HUDCOLOR),
+                        (45, 10 + i * 14))
+            for i, line in enumerate(lines)]
 
 
 def updateEnemyCts(NEnemyFish, NSharks, removedenemy):
@@ -188,65 +720,372 @@ def updateEnemyCts(NEnemyFish, NSharks, removedenemy):
     return NEnemyFish, NSharks
 
 
+def makeEnemies(rng=random, backend=None, settings=None):
+    """Returns an empty enemy container for backend (default BACKEND)
+    drawing its random numbers from rng, with enemies that move
+    according to settings (the defaults if not given)
+    """
+    backend = BACKEND if backend is None else backend
+    settings = Settings() if settings is None else settings
+    if backend == 'objects':
+        return EnemyGroup(rng, FishPool(dirChangeFreq=settings.dirChangeFreq,
+                                        sharkSpeed=settings.sharkSpeed))
+    elif backend == 'numpy':
+        return School(seed=rng.getrandbits(64),
+                      dirChangeFreq=settings.dirChangeFreq,
+                      sharkSpeed=settings.sharkSpeed)
+    raise ValueError('backend must be "objects" or "numpy"')
+
+
+class EnemyGroup(object):
+    """The non-player fish in the active area, one object per fish
+
+    Attributes:
+        enemies:            List of the active EnemyFish and Sharks
+        grid:               SpatialHash used to find enemies near a rect
+        pool:               FishPool recycling removed enemies
+        rng:                Random number source passed to EnemyFish
+        numFish, numSharks: How many of each enemy type are active
+
+    Key Methods:
+        spawnFish, spawnShark:  Adds an enemy
+        spawnFishBatch:         Adds many EnemyFish at once
+        addFish:                Adds EnemyFish with given velocities
+        takeFishOutside:        Removes and returns the EnemyFish
+                                outside a rectangle
+        move:                   Moves every enemy one frame
+        cull:                   Removes enemies outside the active area
+        collide:                Returns the enemies touching the player
+        remove:                 Removes an enemy the player ate
+        getState:               Returns every enemy's type, position,
+                                velocity and size
+        getDrawState:           Returns what drawing needs of every enemy
+        getDrawList:            Returns every enemy's draw list entry
+    """
+
+    def __init__(self, rng=random, pool=None):
+        self.enemies = []
+        self.grid = SpatialHash()
+        self.pool = FishPool() if pool is None else pool
+        self.rng = rng
+        self.numFish, self.numSharks = 0, 0
+        self.frame = 0    # frames moved so far
+        self.spawned = 0  # enemies added so far, for lodphase
+
+    def __len__(self):
+        return len(self.enemies)
+
+    def __iter__(self):
+        return iter(self.enemies)
+
+    def _add(self, enemy):
+        enemy.lodphase = self.spawned
+        enemy.lodinterval = 1
+        enemy.lastmove = self.frame
+        self.spawned += 1
+        self.enemies.append(enemy)
+        self.grid.update(enemy)
+
+    def spawnFish(self, x, y, size):
+        """Adds an EnemyFish"""
+        self._add(self.pool.fish(x, y, size, self.rng))
+        self.numFish += 1
+
+    def spawnFishBatch(self, positions, sizes):
+        """Adds an EnemyFish at each x, y in positions with the matching
+        size in sizes
+        """
+        for (x, y), size in zip(positions, sizes):
+            self.spawnFish(x, y, size)
+
+    def spawnShark(self, x, y, size, player):
+        """Adds a Shark that moves towards player"""
+        self._add(self.pool.shark(x, y, size, player))
+        self.numSharks += 1
+
+    def addFish(self, states):
+        """Adds an EnemyFish for each (x, y, vx, vy, size) in states"""
+        for x, y, vx, vy, size in states:
+            enemy = self.pool.fish(x, y, size, self.rng)
+            enemy.vx, enemy.vy = vx, vy
+            self._add(enemy)
+            self.numFish += 1
+
+    def takeFishOutside(self, rect):
+        """Removes the EnemyFish whose position is outside rect, returns
+        their (x, y, vx, vy, size)
+        """
+        states = []
+        for i in range(len(self.enemies) - 1, -1, -1):
+            enemy = self.enemies[i]
+            if (enemy.etype == 'fish' and
+                    not rect.collidepoint(enemy.x, enemy.y)):
+                del self.enemies[i]
+                self.grid.remove(enemy)
+                self.pool.release(enemy)
+                self.numFish -= 1
+                states.append((enemy.x, enemy.y, enemy.vx, enemy.vy,
+                               enemy.size))
+        return states
+
+    def move(self, view=None):
+        """Moves every enemy and keeps sharks from stacking
+
+        If the camera view is given, EnemyFish far outside it only move
+        every few frames, catching up on the frames they skipped (see
+        lod.py). Sharks always move.
+        """
+        self.frame += 1
+        frame = self.frame
+        for enemy in self.enemies:
+            if (frame + enemy.lodphase) % enemy.lodinterval:
+                continue  # not this fish's turn (see lod.isDue)
+            enemy.move(frame - enemy.lastmove)
+            enemy.lastmove = frame
+            self.grid.update(enemy)  # keep the grid current as fish move
+            # a fish's interval is only looked at again when it moves
+            if view is not None and enemy.etype == 'fish':
+                enemy.lodinterval = updateInterval(
+                    gapOutside(enemy.colrect, view))
+
+        for enemy in self.enemies:
+            if enemy.etype == 'shark':
+                for other in self.grid.near(enemy.colrect):
+                    if (other is not enemy and other.etype == 'shark' and
+                            enemy.colrect.colliderect(other.colrect)):
+                        enemy.separate(other)
+                        self.grid.update(enemy)
+                        self.grid.update(other)
+
+    def cull(self, camera, etype=None):
+        """Removes enemies (only of etype if given) far from the visible
+        area, returns how many
+        """
+        culled = 0
+        # loop through enemies list backwards because some may get deleted
+        for i in range(len(self.enemies) - 1, -1, -1):
+            enemy = self.enemies[i]
+            if etype is not None and enemy.etype != etype:
+                continue
+            if camera.isOutsideActiveArea(enemy):
+                del self.enemies[i]
+                self.grid.remove(enemy)
+                self.pool.release(enemy)
+                self.numFish, self.numSharks = updateEnemyCts(
+                    self.numFish, self.numSharks, enemy)
+                culled += 1
+        return culled
+
+    def collide(self, player, pixels=False):
+        """Returns the enemies whose colrect touches the player's
+
+        With pixels, only those whose opaque pixels also overlap the
+        player's, checked just for the few rects that touch
+        """
+        hits = [enemy for enemy in self.grid.near(player.colrect)
+                if player.colrect.colliderect(enemy.colrect)]
+        if pixels and hits:
+            mine = (player.sprite, player.size, player.facing,
+                    player.colrect.x, player.colrect.y)
+            hits = [enemy for enemy in hits if SPRITES.overlap(
+                mine, (enemy.sprite, enemy.size, enemy.facing,
+                       enemy.colrect.x, enemy.colrect.y))]
+        return hits
+
+    def remove(self, enemy):
+        """Removes an enemy returned by collide"""
+        self.enemies.remove(enemy)
+        self.grid.remove(enemy)
+        self.pool.release(enemy)
+        self.numFish, self.numSharks = updateEnemyCts(
+            self.numFish, self.numSharks, enemy)
+
+    def getState(self):
+        """Returns (etype, x, y, vx, vy, size) for every enemy"""
+        return [(enemy.etype, enemy.x, enemy.y, enemy.vx, enemy.vy,
+                 enemy.size) for enemy in self.enemies]
+
+    def getDrawState(self):
+        """Returns (sprite, x, y, lastx, lasty, size, facing) for every
+        enemy, enough to draw them later
+        """
+        return [(enemy.sprite, enemy.x, enemy.y, enemy.lastx, enemy.lasty,
+                 enemy.size, enemy.facing) for enemy in self.enemies]
+
+    def getDrawList(self, camera, alpha=1.0):
+        """Returns (size, sprite, facing, left, top) in screen pixels
+        for every enemy (see Fish.getDrawItem)
+        """
+        back = 1 - alpha
+        camerax, cameray = camera.getPosition(alpha)
+        # Fish.getDrawItem inlined, this runs for every enemy every frame
+        return [(enemy.size, enemy.sprite, enemy.facing,
+                 int(enemy.x - (enemy.x - enemy.lastx) * back - camerax),
+                 int(enemy.y - (enemy.y - enemy.lasty) * back - cameray))
+                for enemy in self.enemies]
+
+
+def getZoom(size):
+    """Returns the camera zoom for a player size: 1 up to ZOOMSIZE,
+    then stepping down ZOOMLEVELS times per doubling of the size
+    """
+    if size <= ZOOMSIZE:
+        return 1.0
+    steps = math.ceil(math.log(size / float(ZOOMSIZE), 2) * ZOOMLEVELS)
+    return 0.5 ** (steps / float(ZOOMLEVELS))
+
+
 class Camera(object):
     """Camera class handles items related to the visible area
 
     Attributes:
         x, y: top left coordinates of the visible area
+        lastx, lasty: x, y before the camera was last adjusted
+        zoom: window pixels per ocean pixel, below 1 once zoomed out
+        width, height: size of the visible area in ocean pixels
 
     Key Methods
         adjust: Moves the camera (visible area) based on player location
+        setZoom: Zooms in or out, keeping the same center
+        getPosition: Returns x, y or a point between them and lastx, lasty
         getRandomOffCameraPos: Returns position to spawn enemies off-screen
+        getRandomOffCameraPositions: Returns many positions off-screen
+        getView: Returns the rectangle of the visible area
+        getActiveArea: Returns the rectangle enemies are kept inside
         isOutsideActiveArea: Returns boolean if enemy is far from player
     """
 
     def __init__(self):
         self.x, self.y = 0, 0
+        self.lastx, self.lasty = 0, 0
+        self.zoom = 1.0
+        self.width, self.height = WINDOW_WIDTH, WINDOW_HEIGHT
+
+    def setZoom(self, zoom):
+        """Sets the zoom, growing or shrinking the visible area around
+        its center
+        """
+        if zoom == self.zoom:
+            return
+        centerx = self.x + self.width / 2
+        centery = self.y + self.height / 2
+        self.zoom = zoom
+        self.width = int(WINDOW_WIDTH / zoom)
+        self.height = int(WINDOW_HEIGHT / zoom)
+        self.x = centerx - self.width / 2
+        self.y = centery - self.height / 2
 
     def adjust(self, player):
-        """Moves the camera if the player is close to the edge"""
+        """Moves the camera if the player is close to the edge, zooming
+        out as the player grows if ZOOM is on
+        """
+        self.lastx, self.lasty = self.x, self.y
+        if ZOOM:
+            self.setZoom(getZoom(player.size))
+        halfWidth, halfHeight = int(self.width / 2), int(self.height / 2)
+        slack = int(CAMERASLACK / self.zoom)
         halfPlayerSize = int(player.size / 2)
         playerCenterx = player.x + halfPlayerSize
         playerCentery = player.y + halfPlayerSize
-        if (self.x + HALF_WINDOW_WIDTH) - playerCenterx > CAMERASLACK:
-            self.x = playerCenterx + CAMERASLACK - HALF_WINDOW_WIDTH
-        elif playerCenterx - (self.x + HALF_WINDOW_WIDTH) > CAMERASLACK:
-            self.x = playerCenterx - CAMERASLACK - HALF_WINDOW_WIDTH
-        if (self.y + HALF_WINDOW_HEIGHT) - playerCentery > CAMERASLACK:
-            self.y = playerCentery + CAMERASLACK - HALF_WINDOW_HEIGHT
-        elif playerCentery - (self.y + HALF_WINDOW_HEIGHT) > CAMERASLACK:
-            self.y = playerCentery - CAMERASLACK - HALF_WINDOW_HEIGHT
-
-    def getRandomOffCameraPos(self, ObjSize):
+        if (self.x + halfWidth) - playerCenterx > slack:
+            self.x = playerCenterx + slack - halfWidth
+        elif playerCenterx - (self.x + halfWidth) > slack:
+            self.x = playerCenterx - slack - halfWidth
+        if (self.y + halfHeight) - playerCentery > slack:
+            self.y = playerCentery + slack - halfHeight
+        elif playerCentery - (self.y + halfHeight) > slack:
+            self.y = playerCentery - slack - halfHeight
+
+    def getPosition(self, alpha=1.0):
+        """Returns the camera's x, y, or alpha of the way there from
+        lastx, lasty if alpha is below 1
+        """
+        back = 1 - alpha
+        return (self.x - (self.x - self.lastx) * back,
+                self.y - (self.y - self.lasty) * back)
+
+    def getRandomOffCameraPos(self, ObjSize, rng=random):
         """returns x, y coordinates outside the camera view
         (to find where it is ok to draw new enemies)
+        using rng for the random numbers
+        """
+        return self.getRandomOffCameraPositions([ObjSize], rng)[0]
+
+    def getRandomOffCameraPositions(self, sizes, rng=random):
+        """returns a list with x, y coordinates for each object size in
+        sizes, chosen within 1 width/height of the camera so an object
+        that size placed there would not collide with (be seen in) the
+        camera view
+
+        Positions are drawn straight from the area around the view
+        rather than retrying until one lands outside it.
+        """
+        # area positions are chosen from, in the whole pixels of the
+        # Rects fish are culled and seen with
+        area = self.getActiveArea()
+        left, right, top, bottom = area.left, area.right, area.top, area.bottom
+
+        positions = []
+        regions = None
+        for i, size in enumerate(sizes):
+            if i == 0 or size != sizes[i - 1]:
+                regions = self._spawnRegions(size, left, top, right, bottom)
+            # pick a region weighted by its area, then a point in it
+            pick = rng.random() * regions[-1][0]
+            for total, x0, y0, x1, y1 in regions:
+                if pick < total:
+                    break
+            positions.append((x0 + (x1 - x0) * rng.random(),
+                              y0 + (y1 - y0) * rng.random()))
+        return positions
+
+    def _spawnRegions(self, size, left, top, right, bottom):
+        """Splits the spawn area minus the positions a size object would
+        be seen from into up to four rectangles
+
+        Returns (running total area, x0, y0, x1, y1) for each rectangle
+        """
+        # top left corners of objects that would be seen by the camera
+        view = self.getView()
+        seenLeft = max(view.left - size, left)
+        seenTop = max(view.top - size, top)
+        seenRight = min(view.right, right)
+        seenBottom = min(view.bottom, bottom)
+
+        regions = []
+        total = 0
+        for x0, y0, x1, y1 in (
+                (left, top, right, seenTop),                # above
+                (left, seenBottom, right, bottom),          # below
+                (left, seenTop, seenLeft, seenBottom),      # left
+                (seenRight, seenTop, right, seenBottom)):   # right
+            if x1 > x0 and y1 > y0:
+                total += (x1 - x0) * (y1 - y0)
+                regions.append((total, x0, y0, x1, y1))
+        if not regions:
+            raise ValueError('objects of size %d can only spawn in view'
+                             % size)
+        return regions
+
+    def getView(self):
+        """Returns the rectangle of the visible area"""
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+
+    def getActiveArea(self):
+        """Returns the rectangle extending a window length beyond
+        each edge of the window
         """
-        # Rectangle where the visible area is
-        cameraRect = pygame.Rect(self.x, self.y,
-                                 WINDOW_WIDTH, WINDOW_HEIGHT)
-
-        while True:
-            # randomly choose a point within 1 width/height of the camera
-            x = random.uniform(self.x - WINDOW_WIDTH,
-                               self.x + (2 * WINDOW_WIDTH))
-            y = random.uniform(self.y - WINDOW_HEIGHT,
-                               self.y + (2 * WINDOW_HEIGHT))
-            # only return x, y if an ObjSize object placed there
-            # would not collide with (be seen in) the camera view
-            objRect = pygame.Rect(x, y, ObjSize, ObjSize)
-            if not objRect.colliderect(cameraRect):
-                return x, y
+        boundsLeftEdge = self.x - self.width
+        boundsTopEdge = self.y - self.height
+        return pygame.Rect(
+            boundsLeftEdge, boundsTopEdge, self.width * 3, self.height * 3)
 
     def isOutsideActiveArea(self, fish):
         """Returns boolean indicating if fish is far from camera
         (more than a window length beyond edge of window)
         Used to determine if fish should be removed.
         """
-        boundsLeftEdge = self.x - WINDOW_WIDTH
-        boundsTopEdge = self.y - WINDOW_HEIGHT
-        boundsRect = pygame.Rect(
-            boundsLeftEdge, boundsTopEdge, WINDOW_WIDTH * 3, WINDOW_HEIGHT * 3)
-        return not boundsRect.colliderect(fish.colrect)
+        return not self.getActiveArea().colliderect(fish.colrect)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+import argparse
+import hashlib
+import random
+import time
+import pygame
+from pygame.locals import KEYDOWN, KEYUP, K_UP, K_DOWN, K_LEFT, K_RIGHT
+from game import World, useSettings
+from replay import loadReplay
+from savestate import encodeWorld
+
+ARROWKEYS = (K_UP, K_DOWN, K_LEFT, K_RIGHT)
+
+
+class ScriptedInput(object):
+    """Input source that plays back a fixed script of key events
+
+    Attributes:
+        script: Maps a tick to the (event type, key) pairs sent on it,
+                ticks count the calls to get() (the ticks the player
+                could move on)
+        tick:   How many times get() has been called
+    """
+
+    def __init__(self, script=None):
+        self.script = {} if script is None else script
+        self.tick = 0
+
+    def get(self):
+        """Returns the events scripted for the next tick"""
+        events = [pygame.event.Event(etype, key=key)
+                  for etype, key in self.script.get(self.tick, ())]
+        self.tick += 1
+        return events
+
+
+class RandomInput(object):
+    """Input source that mashes the arrow keys at random
+
+    Attributes:
+        rng:        random.Random choosing the keys
+        changefreq: % chance per tick of pressing or releasing a key
+        held:       Keys currently held down
+    """
+
+    def __init__(self, seed=None, changefreq=10):
+        self.rng = random.Random(seed)
+        self.changefreq = changefreq
+        self.held = []
+
+    def get(self):
+        """Returns the events for the next tick"""
+        if self.rng.randint(0, 99) >= self.changefreq:
+            return []
+        if self.held and self.rng.randint(0, 1) == 0:
+            key = self.held.pop(self.rng.randrange(len(self.held)))
+            return [pygame.event.Event(KEYUP, key=key)]
+        key = self.rng.choice(ARROWKEYS)
+        self.held.append(key)
+        return [pygame.event.Event(KEYDOWN, key=key)]
+
+
+def simulate(seed, ticks, inputs=None, backend=None):
+    """Steps a new World up to ticks times without a window, or until
+    the game ends if ticks is None
+
+    Stops early if the game ends, returns the World
+    """
+    world = World(seed, ScriptedInput() if inputs is None else inputs,
+                  backend)
+    while ticks is None or world.tick < ticks:
+        world.step()
+        if world.done:
+            break
+    return world
+
+
+def fingerprint(world):
+    """Returns a hash of the world state, equal for equal states"""
+    player = world.player
+    state = (world.tick, world.invulnerableMode, world.gameOverMode,
+             world.winMode, player.x, player.y, player.vx, player.vy,
+             player.accx, player.accy, player.size, player.health,
+             player.facing, world.camera.x, world.camera.y,
+             world.enemies.getState())
+    return hashlib.sha1(repr(state).encode()).hexdigest()
+
+
+def report(world, elapsed):
+    """Prints the speed and final state of a simulated World"""
+    print('ticks:        %d' % world.tick)
+    print('ticks/s:      %.0f' % (world.tick / elapsed))
+    print('player size:  %d' % world.player.size)
+    print('health:       %d' % world.player.health)
+    print('fingerprint:  %s' % fingerprint(world))
+
+
+def main():
+    """Runs a headless game and reports its speed and final state"""
+    parser = argparse.ArgumentParser(
+        description='Run Fishy without a window as fast as possible')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ticks', type=int, default=3000)
+    parser.add_argument('--backend', choices=('objects', 'numpy'))
+    parser.add_argument('--replay', metavar='FILE',
+                        help='play back the games recorded in FILE '
+                             'instead of pressing random keys')
+    parser.add_argument('--dump', metavar='FILE',
+                        help='write the final world state here (show it '
+                             'with savestate.py)')
+    args = parser.parse_args()
+
+    if not args.replay:
+        startTime = time.perf_counter()
+        world = simulate(args.seed, args.ticks, RandomInput(args.seed),
+                         args.backend)
+        report(world, time.perf_counter() - startTime)
+    else:
+        replay = loadReplay(args.replay)
+        useSettings(replay.settings)
+        for i, game in enumerate(replay.games):
+            startTime = time.perf_counter()
+            world = simulate(game['seed'], None, replay.play(i),
+                             args.backend)
+            print('game:         %d (seed %d)' % (i, game['seed']))
+            report(world, time.perf_counter() - startTime)
+
+    if args.dump:  # the last game's, when playing a replay
+        with open(args.dump, 'wb') as f:
+            f.write(encodeWorld(world))
+
+
+if __name__ == '__main__':
+    main()
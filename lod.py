@@ -0,0 +1,53 @@
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only the School versions need it
+    np = None
+
+# Constants
+#   (gap outside the camera view in pixels, move every this many frames)
+#   fish in view or close to it move every frame, far ones less often
+LODLEVELS = ((0, 1), (160, 2), (320, 4))
+
+
+def gapOutside(rect, view):
+    """Returns how far rect is outside view, 0 if they overlap"""
+    dx = max(view.left - rect.right, rect.left - view.right, 0)
+    dy = max(view.top - rect.bottom, rect.top - view.bottom, 0)
+    return max(dx, dy)
+
+
+def gapsOutside(left, top, size, view):
+    """gapOutside for NumPy arrays of square rects"""
+    dx = np.maximum(np.maximum(view.left - (left + size),
+                               left - view.right), 0)
+    dy = np.maximum(np.maximum(view.top - (top + size),
+                               top - view.bottom), 0)
+    return np.maximum(dx, dy)
+
+
+def updateInterval(gap, levels=LODLEVELS):
+    """Returns how many frames apart a fish gap pixels outside the
+    camera view should move
+    """
+    interval = 1
+    for start, every in levels:
+        if gap >= start:
+            interval = every
+    return interval
+
+
+def updateIntervals(gaps, levels=LODLEVELS):
+    """updateInterval for a NumPy array of gaps"""
+    intervals = np.ones(len(gaps), dtype=np.int64)
+    for start, every in levels:
+        intervals[gaps >= start] = every
+    return intervals
+
+
+def isDue(frame, phase, interval):
+    """Returns if a fish with phase should move on frame
+
+    Fish get different phases so the ones sharing an interval take
+    turns, each frame moves about 1 / interval of them.
+    """
+    return (frame + phase) % interval == 0
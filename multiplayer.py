@@ -0,0 +1,738 @@
+#!/usr/bin/env python
+import argparse
+import errno
+import heapq
+import random
+import socket
+import struct
+import sys
+import time
+from collections import OrderedDict
+import pygame
+from pygame.locals import (KEYDOWN, KEYUP, QUIT, K_UP, K_DOWN, K_LEFT,
+                           K_RIGHT, K_w, K_a, K_s, K_d)
+import game
+from game import (Camera, EnemyGroup, Settings, FPS, TEXTTIME,
+                  HALF_WINDOW_WIDTH, HALF_WINDOW_HEIGHT)
+from fish import (Player, FishPool, FISH_SPRITE, SHARK_SPRITE,
+                  PLAYER_SPRITE)
+from headless import RandomInput
+from sprites import blitBySize, convertSprites
+
+# Constants
+HOST = '127.0.0.1'   # servers only listen on this machine
+PORT = 5555
+INTERESTMARGIN = 128  # pixels beyond a client's view whose fish it is sent
+MAXENTITIES = 256    # most fish and players in a snapshot, nearest first
+MAXHISTORY = 32      # snapshots kept per client to delta against
+NOBASE = 0xFFFFFFFF  # base tick of a snapshot sent in full
+MAXPACKET = 65507    # largest UDP datagram
+JOINTIME = 1         # s a client waits before asking to join again
+MOVEKEYS = (K_UP, K_w, K_DOWN, K_s, K_LEFT, K_a, K_RIGHT, K_d)
+
+# entity kinds sent to clients, and what they are drawn with
+FISH, SHARK, PLAYER = 0, 1, 2
+KINDS = {'fish': FISH, 'shark': SHARK}
+KINDSPRITES = (FISH_SPRITE, SHARK_SPRITE, PLAYER_SPRITE)
+FACINGS = ('left', 'right')
+
+# what a client's own player is doing
+PLAYING, INVULNERABLE, LOST, WON = range(4)
+
+# packets, all little endian, the first byte says which
+#   client -> server: b'J' join, b'L' leave, b'I' input
+#   server -> client: b'W' welcome, b'S' snapshot
+WELCOME = struct.Struct('<cI')   # b'W', uid of the client's player
+INPUT = struct.Struct('<cIB')    # b'I', last tick received, keys held
+KEY = struct.Struct('<I')        # a held key
+HEADER = struct.Struct('<cII')   # b'S', tick, tick it is a delta from
+OWN = struct.Struct('<iiBB')     # camera x, y, health, mode
+COUNT = struct.Struct('<H')      # entities in the next list
+REMOVED = struct.Struct('<I')    # uid
+FULL = struct.Struct('<IBiiHB')  # uid, kind, x, y, size, facing
+MOVED = struct.Struct('<Ihh')    # uid, dx, dy
+
+
+class Seat(object):
+    """One client's player in a SharedWorld
+
+    Attributes:
+        uid:            Id of the player in snapshots
+        player, camera: The Player and the Camera following it
+        held:           Keys the client holds down
+        events:         Key events for the player's next move
+        invulnerableStartTick: Tick the player was last hit, None
+                        while it can be hit
+        endTick:        Tick the player won or lost, None while playing
+        won:            If the player won (rather than lost)
+    """
+
+    def __init__(self, uid, x, y):
+        self.uid = uid
+        self.held = set()
+        self.events = []
+        self.camera = Camera()
+        self.reset(x, y)
+
+    def reset(self, x, y):
+        """Starts a new player at x, y with the camera on it"""
+        self.player = Player(x, y)
+        self.camera.x = self.camera.lastx = x - HALF_WINDOW_WIDTH
+        self.camera.y = self.camera.lasty = y - HALF_WINDOW_HEIGHT
+        self.invulnerableStartTick = None
+        self.endTick = None
+        self.won = False
+
+    def hold(self, keys):
+        """Sets the keys held down, queueing a KEYDOWN or KEYUP for
+        each key that changed
+        """
+        keys = set(keys)
+        self.events += [pygame.event.Event(KEYUP, key=key)
+                        for key in sorted(self.held - keys)]
+        self.events += [pygame.event.Event(KEYDOWN, key=key)
+                        for key in sorted(keys - self.held)]
+        self.held = keys
+
+    def getMode(self):
+        """Returns PLAYING, INVULNERABLE, LOST or WON"""
+        if self.endTick is not None:
+            return WON if self.won else LOST
+        if self.invulnerableStartTick is not None:
+            return INVULNERABLE
+        return PLAYING
+
+
+class SharedWorld(object):
+    """One ocean shared by several players, advanced a tick at a time
+
+    The multiplayer counterpart of World: each Seat has its own Player
+    and Camera, enemies are kept around every camera and Sharks chase
+    whichever player is nearest. Players that win or lose start again
+    at their camera after TEXTTIME.
+
+    Everything per player (spawning, culling, collisions, snapshots)
+    only looks at the enemies near it through the EnemyGroup's
+    SpatialHash, so the cost of each player stays the same however
+    many players, and so fish, the ocean holds.
+
+    Attributes:
+        seats:      Seat for each player, by uid
+        enemies:    EnemyGroup holding every player's enemies
+        settings:   Settings, the enemy counts are per player
+        rng:        random.Random used for spawning and enemies
+        tick:       Ticks since the world started
+        uids:       Maps id() of each enemy to its uid in snapshots
+
+    Key Methods:
+        join, leave:    Adds or removes a player
+        step:           Advances the world one tick
+        getState:       Returns what one player can see
+    """
+
+    def __init__(self, seed=None, settings=None):
+        self.settings = Settings() if settings is None else settings
+        self.rng = random.Random(seed)
+        self.enemies = EnemyGroup(self.rng, FishPool(
+            dirChangeFreq=self.settings.dirChangeFreq,
+            sharkSpeed=self.settings.sharkSpeed))
+        self.seats = OrderedDict()
+        self.uids = {}
+        self.tick = 0
+        self._nextUid = 0
+
+    def _newUid(self):
+        uid = self._nextUid
+        self._nextUid += 1
+        return uid
+
+    def join(self):
+        """Adds a player next to the others, returns its Seat"""
+        x = HALF_WINDOW_WIDTH + 2 * HALF_WINDOW_WIDTH * (len(self.seats) % 3)
+        seat = Seat(self._newUid(), x, HALF_WINDOW_HEIGHT)
+        self.seats[seat.uid] = seat
+        return seat
+
+    def leave(self, seat):
+        """Removes a player, its enemies are culled next tick"""
+        self.seats.pop(seat.uid, None)
+
+    def step(self):
+        """Advances the world one tick"""
+        for seat in self.seats.values():
+            if (seat.endTick is not None and
+                    self.tick - seat.endTick > TEXTTIME * FPS):
+                player = seat.player
+                seat.reset(player.x, player.y)
+        self.spawn()
+        self.update()
+        self.tick += 1
+
+    def _near(self, rect, etype=None):
+        """Returns the enemies (only of etype if given) touching rect"""
+        return [enemy for enemy in self.enemies.grid.near(rect)
+                if (etype is None or enemy.etype == etype) and
+                rect.colliderect(enemy.colrect)]
+
+    def spawn(self):
+        """Tops up the enemies in each player's active area
+
+        Enemies are only placed where no player can see them.
+        """
+        views = [seat.camera.getView() for seat in self.seats.values()]
+        for seat in self.seats.values():
+            player, camera = seat.player, seat.camera
+            area = camera.getActiveArea()
+            missing = (self.settings.numEnemyFish -
+                       len(self._near(area, 'fish')))
+            if missing > 0:
+                low = int(player.size - 2 * player.size ** 0.5)
+                high = int(player.size + player.size ** 0.5)
+                sizes = sorted(self.rng.randint(low, high)
+                               for _ in range(missing))
+                positions = camera.getRandomOffCameraPositions(sizes, self.rng)
+                for (x, y), size in zip(positions, sizes):
+                    if not self._seen(x, y, size, views):
+                        self.enemies.spawnFish(x, y, size)
+            missing = self.settings.numSharks - len(self._near(area, 'shark'))
+            for _ in range(missing):
+                size = player.size + 75
+                x, y = camera.getRandomOffCameraPos(size, self.rng)
+                if not self._seen(x, y, size, views):
+                    self.enemies.spawnShark(x, y, size, player)
+
+    def _seen(self, x, y, size, views):
+        """Returns if a size fish at x, y would be in any of views"""
+        rect = pygame.Rect(x, y, size, size)
+        return rect.collidelist(views) != -1
+
+    def update(self):
+        """Moves everything and settles collisions with the players"""
+        players = []
+        for seat in self.seats.values():
+            if (seat.invulnerableStartTick is not None and
+                    self.tick - seat.invulnerableStartTick >
+                    self.settings.invulnTime * FPS):
+                seat.invulnerableStartTick = None
+            events, seat.events = seat.events, []
+            if seat.endTick is None:
+                seat.player.move(events)
+                seat.camera.adjust(seat.player)
+                players.append(seat.player)
+
+        if players:
+            for enemy in self.enemies:
+                if enemy.etype == 'shark':
+                    enemy.player = self._nearest(enemy, players)
+        self.enemies.move()
+        self.cull()
+        for seat in self.seats.values():
+            if seat.endTick is None:
+                self.collide(seat)
+
+    def _nearest(self, enemy, players):
+        """Returns the player whose center is closest to enemy's"""
+        cx, cy = enemy.x + enemy.size / 2, enemy.y + enemy.size / 2
+        return min(players, key=lambda p: (p.x + p.size / 2 - cx) ** 2 +
+                   (p.y + p.size / 2 - cy) ** 2)
+
+    def cull(self):
+        """Removes the enemies outside every player's active area"""
+        kept = set()
+        for seat in self.seats.values():
+            kept.update(id(enemy) for enemy in
+                        self._near(seat.camera.getActiveArea()))
+        for enemy in [enemy for enemy in self.enemies
+                      if id(enemy) not in kept]:
+            self._remove(enemy)
+
+    def _remove(self, enemy):
+        self.enemies.remove(enemy)
+        self.uids.pop(id(enemy), None)  # a reused enemy gets a new uid
+
+    def collide(self, seat):
+        """Lets a player eat or be hurt by the enemies it touches"""
+        player = seat.player
+        for enemy in self.enemies.collide(player, game.PIXELCOLLIDE):
+            if enemy.size < player.size:
+                player.eat(enemy)
+                self._remove(enemy)
+                if player.size > self.settings.winSize:
+                    seat.endTick, seat.won = self.tick, True
+                    return
+            elif seat.invulnerableStartTick is None:
+                seat.invulnerableStartTick = self.tick
+                player.health -= 1
+                if player.health == 0:
+                    seat.endTick = self.tick
+                    return
+
+    def getState(self, seat):
+        """Returns what seat's player can see, its own (camera x, y,
+        health, mode) and a dict of uid -> (kind, x, y, size, facing)
+        for the fish and players in or near its view
+
+        Only the MAXENTITIES nearest the middle of the view are kept,
+        so a crowded ocean cannot grow a snapshot past one datagram.
+        The seat's own player is always kept.
+        """
+        view = seat.camera.getView()
+        area = view.inflate(2 * INTERESTMARGIN, 2 * INTERESTMARGIN)
+        centerx, centery = view.center
+        entities = []
+        for enemy in self._near(area):
+            uid = self.uids.get(id(enemy))
+            if uid is None:
+                uid = self.uids[id(enemy)] = self._newUid()
+            entities.append((uid, (KINDS[enemy.etype], int(enemy.x),
+                                   int(enemy.y), enemy.size,
+                                   FACINGS.index(enemy.facing))))
+        for other in self.seats.values():
+            player = other.player
+            if other.endTick is None and area.colliderect(player.colrect):
+                entities.append((other.uid, (PLAYER, int(player.x),
+                                             int(player.y), player.size,
+                                             FACINGS.index(player.facing))))
+        if len(entities) > MAXENTITIES:
+
+            def distance(item):
+                uid, entity = item
+                if uid == seat.uid:
+                    return -1
+                half = entity[3] // 2
+                return ((entity[1] + half - centerx) ** 2 +
+                        (entity[2] + half - centery) ** 2)
+            entities = heapq.nsmallest(MAXENTITIES, entities, distance)
+        camera = seat.camera
+        own = (int(camera.x), int(camera.y), seat.player.health,
+               seat.getMode())
+        return own, dict(entities)
+
+
+def encodeSnapshot(tick, base, own, state, baseState):
+    """Returns a snapshot packet of own and state for tick, as changes
+    from baseState (the state sent on tick base) unless base is NOBASE
+
+    Entities in baseState that are gone are listed by uid, ones that
+    only moved as their offset, and new or changed ones in full, those
+    that did not change at all are left out.
+    """
+    removed = [uid for uid in baseState if uid not in state]
+    full, moved = [], []
+    for uid, entity in state.items():
+        old = baseState.get(uid)
+        if old == entity:
+            continue
+        if (old is not None and old[0] == entity[0] and
+                old[3:] == entity[3:]):
+            dx, dy = entity[1] - old[1], entity[2] - old[2]
+            if -32768 <= dx < 32768 and -32768 <= dy < 32768:
+                moved.append(MOVED.pack(uid, dx, dy))
+                continue
+        full.append(FULL.pack(uid, *entity))
+    parts = [HEADER.pack(b'S', tick, base), OWN.pack(*own),
+             COUNT.pack(len(removed))]
+    parts += [REMOVED.pack(uid) for uid in removed]
+    parts.append(COUNT.pack(len(full)))
+    parts += full
+    parts.append(COUNT.pack(len(moved)))
+    parts += moved
+    return b''.join(parts)
+
+
+def decodeSnapshot(data, states):
+    """Returns (tick, own, state) from a snapshot packet, states maps
+    the ticks of earlier states to them
+
+    Returns None if the packet is a delta from a state not in states,
+    raises ValueError if it is cut short or lists entities that can't
+    be (which only a corrupt or spoofed datagram does).
+    """
+    try:
+        _, tick, base = HEADER.unpack_from(data)
+        if base == NOBASE:
+            state = {}
+        elif base in states:
+            state = dict(states[base])
+        else:
+            return None
+        offset = HEADER.size
+        own = OWN.unpack_from(data, offset)
+        offset += OWN.size
+        for record, apply in ((REMOVED, _removeEntity), (FULL, _setEntity),
+                              (MOVED, _moveEntity)):
+            count, = COUNT.unpack_from(data, offset)
+            offset += COUNT.size
+            for _ in range(count):
+                apply(state, record.unpack_from(data, offset))
+                offset += record.size
+    except (struct.error, KeyError):
+        raise ValueError('malformed snapshot')
+    if offset != len(data):
+        raise ValueError('malformed snapshot')
+    return tick, own, state
+
+
+def _removeEntity(state, fields):
+    del state[fields[0]]
+
+
+def _setEntity(state, fields):
+    uid, kind, x, y, size, facing = fields
+    if kind >= len(KINDSPRITES) or facing >= len(FACINGS):
+        raise KeyError(uid)
+    state[uid] = fields[1:]
+
+
+def _moveEntity(state, fields):
+    uid, dx, dy = fields
+    kind, x, y, size, facing = state[uid]
+    state[uid] = (kind, x + dx, y + dy, size, facing)
+
+
+class Connection(object):
+    """What an OceanServer keeps about one client
+
+    Attributes:
+        seat:   The client's Seat
+        acked:  Last tick the client said it received
+        sent:   Maps the ticks of recent snapshots to the state sent
+        bytes:  Snapshot bytes sent to the client so far
+        count:  Snapshots sent to the client so far
+    """
+
+    def __init__(self, seat):
+        self.seat = seat
+        self.acked = NOBASE
+        self.sent = OrderedDict()
+        self.bytes = 0
+        self.count = 0
+
+
+class OceanServer(object):
+    """Runs a SharedWorld for clients connecting over UDP
+
+    Each tick every client is sent a snapshot of what its player can
+    see, as changes from the last snapshot it acknowledged (or in full
+    if that is too old), and each client keeps sending the keys it
+    holds with the last tick it received. Lost packets need no resends:
+    a lost snapshot is covered by the next one, a lost input by the
+    next one from the client.
+
+    Attributes:
+        world:          The SharedWorld being run
+        sock:           The UDP socket
+        connections:    Connection for each client address
+        tickTime:       Seconds spent in tick so far
+        ticks:          Ticks run so far
+
+    Key Methods:
+        tick:   Reads the client packets, steps and sends snapshots
+        serve:  Runs ticks FPS times a second
+        close:  Closes the socket
+    """
+
+    def __init__(self, address=(HOST, PORT), seed=None, settings=None):
+        self.world = SharedWorld(seed, settings)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(address)
+        self.sock.setblocking(False)
+        self.connections = {}
+        self.tickTime = 0.0
+        self.ticks = 0
+
+    def poll(self):
+        """Handles every packet waiting on the socket"""
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAXPACKET)
+            except (BlockingIOError, InterruptedError):
+                return
+            except ConnectionResetError:
+                continue  # a client went away (reported on Windows)
+            kind = data[:1]
+            connection = self.connections.get(address)
+            if kind == b'J':
+                if connection is None:
+                    connection = Connection(self.world.join())
+                    self.connections[address] = connection
+                self.sock.sendto(WELCOME.pack(b'W', connection.seat.uid),
+                                 address)
+            elif connection is None:
+                continue
+            elif kind == b'L':
+                self.world.leave(connection.seat)
+                del self.connections[address]
+            elif kind == b'I' and len(data) >= INPUT.size:
+                _, acked, count = INPUT.unpack_from(data)
+                if len(data) != INPUT.size + count * KEY.size:
+                    continue  # cut short or spoofed
+                if acked != NOBASE and acked > self.world.tick:
+                    continue
+                keys = [KEY.unpack_from(data, INPUT.size + i * KEY.size)[0]
+                        for i in range(count)]
+                connection.seat.hold(key for key in keys if key in MOVEKEYS)
+                if acked != NOBASE and (connection.acked == NOBASE or
+                                        acked > connection.acked):
+                    connection.acked = acked
+
+    def tick(self):
+        """Handles the client packets, steps the world and sends every
+        client its snapshot
+        """
+        startTime = time.perf_counter()
+        self.poll()
+        self.world.step()
+        for address, connection in self.connections.items():
+            self.send(address, connection)
+        self.tickTime += time.perf_counter() - startTime
+        self.ticks += 1
+
+    def send(self, address, connection):
+        """Sends a client the snapshot for this tick"""
+        sent = connection.sent
+        # states older than the one acknowledged are never needed again
+        while sent and next(iter(sent)) < connection.acked:
+            sent.popitem(last=False)
+        base = connection.acked if connection.acked in sent else NOBASE
+        own, state = self.world.getState(connection.seat)
+        tick = self.world.tick
+        data = encodeSnapshot(tick, base, own, state, sent.get(base, {}))
+        sent[tick] = state
+        if len(sent) > MAXHISTORY:
+            sent.popitem(last=False)
+        try:
+            self.sock.sendto(data, address)
+        except OSError as error:
+            if error.errno == errno.EMSGSIZE:
+                sys.stderr.write('snapshot of %d bytes for %s:%d is too '
+                                 'large to send\n' % ((len(data),) + address))
+            # otherwise the client is gone, either way the state is sent
+            # again next tick
+            return
+        connection.bytes += len(data)
+        connection.count += 1
+
+    def serve(self, seconds=None):
+        """Runs a tick FPS times a second, for seconds if given"""
+        startTime = time.perf_counter()
+        nextTick = startTime
+        while seconds is None or time.perf_counter() - startTime < seconds:
+            self.tick()
+            nextTick += 1.0 / FPS
+            wait = nextTick - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                nextTick = time.perf_counter()  # fell behind, don't race
+
+    def close(self):
+        """Closes the socket"""
+        self.sock.close()
+
+
+class OceanClient(object):
+    """Connects to an OceanServer and keeps the latest snapshot
+
+    Attributes:
+        server:     Address of the server
+        sock:       The UDP socket
+        uid:        Id of this client's player, None until welcomed
+        tick:       Tick of the latest snapshot, NOBASE before one
+        own:        (camera x, y, health, mode) from the latest snapshot
+        state:      uid -> (kind, x, y, size, facing) of what the player
+                    can see in the latest snapshot
+        states:     Maps the ticks of recent snapshots to their state,
+                    for decoding the next ones
+
+    Key Methods:
+        poll:   Reads the packets from the server
+        send:   Tells the server the keys held down
+        leave:  Tells the server the player left and closes the socket
+    """
+
+    def __init__(self, server=(HOST, PORT)):
+        self.server = server
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.uid = None
+        self.tick = NOBASE
+        self.own = (0, 0, 3, PLAYING)
+        self.state = {}
+        self.states = OrderedDict()
+        self._joinTime = None
+
+    def poll(self):
+        """Reads every packet waiting from the server, asking to join
+        until it answers
+        """
+        if self.uid is None and (self._joinTime is None or
+                                 time.perf_counter() - self._joinTime >
+                                 JOINTIME):
+            self.sock.sendto(b'J', self.server)
+            self._joinTime = time.perf_counter()
+        while True:
+            try:
+                data = self.sock.recv(MAXPACKET)
+            except (BlockingIOError, InterruptedError):
+                return
+            except ConnectionResetError:
+                continue  # no server yet (reported on Windows)
+            kind = data[:1]
+            if kind == b'W' and len(data) == WELCOME.size:
+                self.uid = WELCOME.unpack(data)[1]
+            elif kind == b'S':
+                self._receive(data)
+
+    def _receive(self, data):
+        try:
+            decoded = decodeSnapshot(data, self.states)
+        except ValueError:
+            return  # corrupt, the next one replaces it
+        if decoded is None:
+            return  # a delta from a state already dropped
+        tick, own, state = decoded
+        if self.tick != NOBASE and tick <= self.tick:
+            return  # arrived out of order
+        self.tick, self.own, self.state = tick, own, state
+        self.states[tick] = state
+        if len(self.states) > MAXHISTORY:
+            self.states.popitem(last=False)
+
+    def send(self, keys):
+        """Tells the server which keys are held down"""
+        if self.uid is None:
+            return
+        keys = [key for key in keys if key in MOVEKEYS]
+        data = INPUT.pack(b'I', self.tick, len(keys))
+        data += b''.join(KEY.pack(key) for key in keys)
+        self.sock.sendto(data, self.server)
+
+    def leave(self):
+        """Tells the server this player left, closes the socket"""
+        if self.uid is not None:
+            self.sock.sendto(b'L', self.server)
+        self.sock.close()
+
+
+def drawClient(screen, client, flash):
+    """Draws the latest snapshot of client, hiding its player if flash"""
+    camerax, cameray, health, mode = client.own
+    screen.fill(game.WATER_COLOR)
+    blitBySize(screen, [
+        (size, KINDSPRITES[kind], FACINGS[facing], x - camerax, y - cameray)
+        for uid, (kind, x, y, size, facing) in client.state.items()
+        if not (uid == client.uid and mode == INVULNERABLE and flash)])
+    game.SCREEN = screen
+    game.drawHealthMeter(health)
+
+
+def runClient(address):
+    """Plays in a window on the server at address"""
+    pygame.init()
+    screen = pygame.display.set_mode((game.WINDOW_WIDTH, game.WINDOW_HEIGHT))
+    pygame.display.set_caption('Fishy - multiplayer')
+    convertSprites()
+    font = pygame.font.Font('freesansbold.ttf', 32)
+    clock = pygame.time.Clock()
+    client = OceanClient(address)
+    held = set()
+    try:
+        while True:
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    return
+                elif event.type == KEYDOWN:
+                    held.add(event.key)
+                elif event.type == KEYUP:
+                    held.discard(event.key)
+            client.poll()
+            client.send(held)
+            tick = 0 if client.tick == NOBASE else client.tick
+            drawClient(screen, client, tick * 10 // FPS % 2 == 1)
+            message = {LOST: 'Game Over', WON: 'You Win!'}.get(client.own[3])
+            if client.uid is None:
+                message = 'Joining %s:%d...' % address
+            if message:
+                text = font.render(message, True, game.WHITE)
+                screen.blit(text, text.get_rect(
+                    center=(HALF_WINDOW_WIDTH, HALF_WINDOW_HEIGHT)))
+            pygame.display.update()
+            clock.tick(FPS)
+    finally:
+        client.leave()
+        pygame.quit()
+
+
+def runLocal(clients, ticks, seed=None, settings=None, address=(HOST, PORT)):
+    """Runs a server and clients pressing random keys in this process,
+    as fast as they go, returns the server
+    """
+    server = OceanServer(address, seed, settings)
+    rng = random.Random(seed)
+    players = [(OceanClient(address), RandomInput(rng.getrandbits(32)), set())
+               for _ in range(clients)]
+    try:
+        for _ in range(ticks):
+            for client, inputs, held in players:
+                client.poll()
+                for event in inputs.get():
+                    if event.type == KEYDOWN:
+                        held.add(event.key)
+                    else:
+                        held.discard(event.key)
+                client.send(held)
+            server.tick()
+    finally:
+        for client, _, _ in players:
+            client.leave()
+        server.close()
+    return server
+
+
+def main():
+    """Runs a server, a windowed client, or a local test of both"""
+    parser = argparse.ArgumentParser(
+        description='Share one Fishy ocean between several players')
+    parser.add_argument('mode', choices=('server', 'client', 'local'),
+                        help='server: run a server, client: play on one, '
+                             'local: run a server and bot clients here '
+                             'and report the bandwidth and tick cost')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--fish', type=int,
+                        help='EnemyFish kept around each player')
+    parser.add_argument('--clients', type=int, default=4,
+                        help='bot clients for local')
+    parser.add_argument('--ticks', type=int, default=900,
+                        help='ticks to run for local')
+    args = parser.parse_args()
+    address = (HOST, args.port)
+    settings = Settings(numEnemyFish=args.fish)
+
+    if args.mode == 'client':
+        runClient(address)
+    elif args.mode == 'server':
+        server = OceanServer(address, args.seed, settings)
+        sys.stderr.write('serving on %s:%d\n' % address)
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+    else:
+        server = runLocal(args.clients, args.ticks, args.seed, settings,
+                          address)
+        connections = list(server.connections.values())
+        print('%d clients, %d ticks, %d enemies in the ocean'
+              % (len(connections), server.ticks, len(server.world.enemies)))
+        print('server tick: %.3f ms' % (1000 * server.tickTime / server.ticks))
+        for connection in connections:
+            print('client %d: %.0f bytes per snapshot'
+                  % (connection.seat.uid,
+                     connection.bytes / max(connection.count, 1)))
+
+
+if __name__ == '__main__':
+    main()
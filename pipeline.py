@@ -0,0 +1,165 @@
+import threading
+from collections import namedtuple
+
+
+class EventQueue(object):
+    """Hands pygame events from the main thread to the simulation thread
+
+    pygame has to read events on the thread that opened the window, so
+    the main thread puts them here and the World's input source gets
+    them from here instead of pygame.event.
+
+    Key Methods:
+        put:    Adds events, called on the main thread
+        get:    Returns and removes every event put so far
+    """
+
+    def __init__(self):
+        self._events = []
+        self._lock = threading.Lock()
+
+    def put(self, events):
+        """Adds a list of events"""
+        with self._lock:
+            self._events.extend(events)
+
+    def get(self):
+        """Returns the events put since the last call"""
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+
+class CameraState(namedtuple('CameraState', 'x y lastx lasty zoom')):
+    """Copy of a Camera's position, last position and zoom"""
+
+    __slots__ = ()
+
+    def getPosition(self, alpha=1.0):
+        """Returns x, y, or alpha of the way there from lastx, lasty
+        (see Camera.getPosition)
+        """
+        back = 1 - alpha
+        return (self.x - (self.x - self.lastx) * back,
+                self.y - (self.y - self.lasty) * back)
+
+
+class Snapshot(namedtuple('Snapshot', 'tick moved camera health player '
+                                      'enemies instructions winMode '
+                                      'gameOverMode')):
+    """Everything needed to draw a World as it was after one tick
+
+    Snapshots are never changed, so one can be drawn while the World
+    it came from keeps stepping.
+
+    Attributes:
+        tick, moved:        The World's tick and moved
+        camera:             CameraState of the World's Camera
+        health:             The player's health
+        player:             (sprite, x, y, lastx, lasty, size, facing)
+                            of the player, None while it is hidden
+        enemies:            The same for every enemy
+        instructions:       If the instructions are up
+        winMode:            If the player has won
+        gameOverMode:       If the player has lost
+    """
+
+    __slots__ = ()
+
+    def showingInstructions(self):
+        """Returns if the instructions are up (see World)"""
+        return self.instructions
+
+
+def takeSnapshot(world):
+    """Returns a Snapshot of world as it is now"""
+    camera, player = world.camera, world.player
+    shown = not world.gameOverMode and not (world.invulnerableMode and
+                                            world.flashIsOn())
+    return Snapshot(
+        world.tick, world.moved,
+        CameraState(camera.x, camera.y, camera.lastx, camera.lasty,
+                    camera.zoom),
+        player.health,
+        (player.sprite, player.x, player.y, player.lastx, player.lasty,
+         player.size, player.facing) if shown else None,
+        world.enemies.getDrawState(),
+        world.showingInstructions(), world.winMode, world.gameOverMode)
+
+
+class SimulationThread(object):
+    """Steps a World on a worker thread while the main thread draws
+
+    Double buffered: the main thread draws snapshot (the front buffer)
+    while the worker steps the World and fills the back buffer with a
+    new Snapshot, and wait swaps them. The World must only be touched
+    between wait and the next start.
+
+    Attributes:
+        world:      The World being stepped
+        snapshot:   Snapshot of the World after the last finished ticks
+
+    Key Methods:
+        start:  Starts stepping the World some ticks on the worker
+        wait:   Waits for those ticks and returns their Snapshot
+        stop:   Ends the worker thread
+    """
+
+    def __init__(self, world):
+        self.world = world
+        self.snapshot = takeSnapshot(world)
+        self._back = None
+        self._ticks = 0
+        self._error = None
+        self._stopping = False
+        self._go = threading.Event()
+        self._ready = threading.Event()
+        self._ready.set()
+        self._thread = threading.Thread(target=self._run, name='simulation')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._go.wait()
+            self._go.clear()
+            if self._stopping:
+                return
+            try:
+                for _ in range(self._ticks):
+                    self.world.step()
+                    if self.world.done:
+                        break
+                self._back = takeSnapshot(self.world)
+            except BaseException as e:  # hand even SystemExit to wait
+                self._error = e
+            self._ready.set()
+
+    def start(self, ticks):
+        """Starts stepping the World ticks times (stopping early if the
+        game ends) on the worker thread
+        """
+        if not self._ready.is_set():
+            raise RuntimeError('the last ticks have not finished')
+        self._ticks = ticks
+        self._ready.clear()
+        self._go.set()
+
+    def wait(self):
+        """Waits for the ticks started last and returns the Snapshot
+        taken after them, raising anything they raised
+        """
+        self._ready.wait()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        if self._back is not None:
+            self.snapshot, self._back = self._back, None  # swap buffers
+        return self.snapshot
+
+    def stop(self):
+        """Waits for any ticks in progress and ends the worker thread"""
+        self._ready.wait()
+        self._stopping = True
+        self._go.set()
+        self._thread.join()
@@ -0,0 +1,201 @@
+import csv
+import json
+import math
+import time
+from contextlib import contextmanager
+
+PHASES = ('spawn', 'move', 'cull', 'collide', 'draw')  # main loop phases
+COUNTERS = ('spawns', 'culls')  # events counted each frame
+HISTORYSIZE = 900  # frames kept by FrameProfiler (30 s at 30 FPS)
+
+
+class PhaseTimer(object):
+    """Times how long each phase of every frame takes
+
+    Attributes:
+        current:    Seconds spent in each phase of the unfinished frame
+        frames:     List of the finished frames' phase times
+        counts:     Totals of the events counted with count
+
+    Key Methods:
+        phase:      Context manager timing one phase
+        count:      Counts events such as spawns or culls
+        endFrame:   Finishes the current frame
+        summary:    Returns the mean and p99 time of each phase
+    """
+
+    def __init__(self):
+        self.current = {}
+        self.frames = []
+        self.counts = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Adds the time spent inside the with block to phase name"""
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - startTime
+            self.current[name] = self.current.get(name, 0) + elapsed
+
+    def count(self, name, n=1):
+        """Adds n events to counter name"""
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def endFrame(self):
+        """Stores the current frame's times and starts a new frame"""
+        self.frames.append(self.current)
+        self.current = {}
+
+    def summary(self):
+        """Returns {phase: {'mean_ms': ..., 'p99_ms': ...}} over all
+        finished frames, plus a 'frame' entry for the phases combined
+        """
+        names = [name for name in PHASES
+                 if any(name in frame for frame in self.frames)]
+        names += sorted(set(name for frame in self.frames
+                            for name in frame) - set(names))
+        result = {}
+        for name in names:
+            result[name] = _stats([frame.get(name, 0)
+                                   for frame in self.frames])
+        result['frame'] = _stats([sum(frame.values())
+                                  for frame in self.frames])
+        return result
+
+
+class FrameProfiler(PhaseTimer):
+    """PhaseTimer for the live game that keeps a fixed-size history
+
+    Each finished frame becomes a record of its frame time (since the
+    previous frame ended, sleeping included), its phase times, the
+    active enemy counts and its spawns and culls. Only the latest
+    records are kept, in a ring buffer.
+
+    Attributes:
+        size:       Most frames kept in the history
+        target:     FPS the game is trying to reach
+
+    Key Methods:
+        endFrame:   Finishes the current frame, recording enemy counts
+        history:    Returns the kept records, oldest first
+        averages:   Returns the mean of each column over recent frames
+        dump:       Writes the history to a .csv or .json file
+    """
+
+    COLUMNS = (('frame', 'frame_ms') +
+               tuple(name + '_ms' for name in PHASES) +
+               ('fish', 'sharks') + COUNTERS)
+
+    def __init__(self, target, size=HISTORYSIZE):
+        if size <= 0:
+            raise ValueError('size must be positive')
+        super(FrameProfiler, self).__init__()
+        self.size = size
+        self.target = target
+        self._records = [None] * size
+        self._next = 0       # slot the next record goes in
+        self._numFrames = 0  # frames finished so far
+        self._lastEnd = None
+        self._frameCounts = {}
+
+    def count(self, name, n=1):
+        """Adds n events to counter name for this frame"""
+        super(FrameProfiler, self).count(name, n)
+        self._frameCounts[name] = self._frameCounts.get(name, 0) + n
+
+    def endFrame(self, numFish=0, numSharks=0):
+        """Records the current frame and starts a new one"""
+        now = time.perf_counter()
+        if self._lastEnd is None:
+            frameTime = sum(self.current.values())
+        else:
+            frameTime = now - self._lastEnd
+        self._lastEnd = now
+
+        record = {'frame': self._numFrames,
+                  'frame_ms': 1000 * frameTime,
+                  'fish': numFish,
+                  'sharks': numSharks}
+        for name in PHASES:
+            record[name + '_ms'] = 1000 * self.current.get(name, 0)
+        for name in COUNTERS:
+            record[name] = self._frameCounts.get(name, 0)
+
+        self._records[self._next] = record
+        self._next = (self._next + 1) % self.size
+        self._numFrames += 1
+        self.current = {}
+        self._frameCounts = {}
+
+    def history(self):
+        """Returns the kept frame records, oldest first"""
+        if self._numFrames < self.size:
+            return self._records[:self._numFrames]
+        return self._records[self._next:] + self._records[:self._next]
+
+    def averages(self, frames=None):
+        """Returns the mean of each column over the last frames frames
+        (the last second by default), with 'fps' for the frame rate
+        achieved and spawns/culls as rates per second
+        """
+        frames = int(self.target) if frames is None else frames
+        recent = self.history()[-frames:]
+        if not recent:
+            return None
+        result = {}
+        for column in self.COLUMNS[1:]:
+            result[column] = (sum(record[column] for record in recent) /
+                              float(len(recent)))
+        seconds = result['frame_ms'] / 1000.0
+        result['fps'] = 1 / seconds if seconds > 0 else 0.0
+        for name in COUNTERS:
+            result[name] = result[name] / seconds if seconds > 0 else 0.0
+        return result
+
+    def dump(self, path):
+        """Writes the history to path as CSV, or JSON if path ends in
+        .json
+        """
+        records = self.history()
+        with open(path, 'w') as f:
+            if path.lower().endswith('.json'):
+                json.dump({'target_fps': self.target, 'frames': records},
+                          f, indent=1)
+            else:
+                writer = csv.DictWriter(f, self.COLUMNS)
+                writer.writeheader()
+                writer.writerows(records)
+
+
+class NullTimer(object):
+    """Stand-in for PhaseTimer that records nothing"""
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def count(self, name, n=1):
+        pass
+
+    def endFrame(self, *args):
+        pass
+
+
+def percentile(values, pct):
+    """Returns the nearest-rank pct percentile of values"""
+    ordered = sorted(values)
+    rank = max(int(math.ceil(pct / 100.0 * len(ordered))), 1)
+    return ordered[rank - 1]
+
+
+def _stats(seconds):
+    """Returns the mean and p99 of a list of times in milliseconds"""
+    if not seconds:
+        return {'mean_ms': 0.0, 'p99_ms': 0.0}
+    return {'mean_ms': 1000 * sum(seconds) / len(seconds),
+            'p99_ms': 1000 * percentile(seconds, 99)}
+
+
+NULLTIMER = NullTimer()  # shared by every World that isn't being timed
@@ -0,0 +1,143 @@
+import json
+import pygame
+from pygame.locals import KEYDOWN, KEYUP
+
+REPLAYVERSION = 1  # bumped whenever the file format changes
+KEYEVENTS = {KEYDOWN: 1, KEYUP: 0}  # event type -> code stored in files
+EVENTTYPES = dict((code, etype) for etype, code in KEYEVENTS.items())
+
+
+class Replay(object):
+    """The key presses of recorded games, enough to play them again
+
+    A World only needs its seed and the keys pressed on each tick to
+    step through the same states again, so that is all that is kept
+    for each game, along with the settings the games were played with.
+
+    Ticks count calls to the input source's get(), the ticks the player
+    could move on. Files are JSON with each game's key events flattened
+    into a list of [ticks since the last event, 1 for KEYDOWN or 0 for
+    KEYUP, key] triples.
+
+    Attributes:
+        settings:   Game settings the games were played with
+        games:      Recorded games as dicts of 'seed', 'ticks' (get()
+                    calls made) and 'keys' (a list of (tick, event
+                    type, key))
+
+    Key Methods:
+        record: Starts recording a new game, returns its input source
+        play:   Returns an input source playing back a recorded game
+        save:   Writes the replay to a file
+    """
+
+    def __init__(self, settings=None, games=None):
+        self.settings = {} if settings is None else settings
+        self.games = [] if games is None else games
+
+    def record(self, seed, inputs):
+        """Starts recording a game played with seed, returns an input
+        source passing on the events of inputs
+        """
+        game = {'seed': seed, 'ticks': 0, 'keys': []}
+        self.games.append(game)
+        return InputRecorder(inputs, game)
+
+    def play(self, index, live=None):
+        """Returns an input source playing back game index"""
+        return ReplayInput(self.games[index], live)
+
+    def save(self, path):
+        """Writes the replay to path"""
+        games = []
+        for game in self.games:
+            keys, last = [], 0
+            for tick, etype, key in game['keys']:
+                keys += [tick - last, KEYEVENTS[etype], key]
+                last = tick
+            games.append({'seed': game['seed'], 'ticks': game['ticks'],
+                          'keys': keys})
+        with open(path, 'w') as f:
+            json.dump({'version': REPLAYVERSION, 'settings': self.settings,
+                       'games': games}, f, separators=(',', ':'))
+
+
+def loadReplay(path):
+    """Returns the Replay saved in path"""
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('version') != REPLAYVERSION:
+        raise ValueError('%s is not a version %d replay'
+                         % (path, REPLAYVERSION))
+    games = []
+    for game in data['games']:
+        flat, keys, tick = game['keys'], [], 0
+        for i in range(0, len(flat), 3):
+            tick += flat[i]
+            keys.append((tick, EVENTTYPES[flat[i + 1]], flat[i + 2]))
+        games.append({'seed': game['seed'], 'ticks': game['ticks'],
+                      'keys': keys})
+    return Replay(data['settings'], games)
+
+
+class InputRecorder(object):
+    """Input source that passes on another's events, recording the
+    key presses and releases into a Replay game
+
+    Attributes:
+        inputs: The input source being recorded
+        game:   The Replay game dict being filled in
+    """
+
+    def __init__(self, inputs, game):
+        self.inputs = inputs
+        self.game = game
+
+    def get(self):
+        """Returns and records the events for the next tick"""
+        events = self.inputs.get()
+        tick = self.game['ticks']
+        for event in events:
+            if event.type in KEYEVENTS:
+                self.game['keys'].append((tick, event.type, event.key))
+        self.game['ticks'] = tick + 1
+        return events
+
+
+class ReplayInput(object):
+    """Input source playing back the key events of a Replay game
+
+    finished is set when get() is called past the recorded ticks, which
+    ends the World. A game that ended by itself ends the same way again
+    before that, one that was quit ends a tick after the recording
+    stopped.
+
+    Attributes:
+        game:       The Replay game dict being played
+        live:       Input source whose other events (such as QUIT) are
+                    passed on, so a replay in a window can be closed
+        tick:       How many times get() has been called
+        finished:   True once get() was called past the recording
+    """
+
+    def __init__(self, game, live=None):
+        self.game = game
+        self.live = live
+        self.tick = 0
+        self.finished = False
+        self._keys = {}  # tick -> [(event type, key)]
+        for tick, etype, key in game['keys']:
+            self._keys.setdefault(tick, []).append((etype, key))
+
+    def get(self):
+        """Returns the recorded events for the next tick"""
+        events = []
+        if self.live is not None:
+            events = [event for event in self.live.get()
+                      if event.type not in KEYEVENTS]
+        events += [pygame.event.Event(etype, key=key)
+                   for etype, key in self._keys.get(self.tick, ())]
+        self.tick += 1
+        if self.tick > self.game['ticks']:
+            self.finished = True
+        return events
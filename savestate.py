@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+import argparse
+import struct
+import sys
+import zlib
+from array import array
+from collections import deque
+from school import School
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only School states need it
+    np = None
+
+# Constants
+STATEVERSION = 1     # bumped whenever the format changes
+MAGIC = b'FSHY'
+REWINDTICKS = 300    # ticks a RewindBuffer keeps by default (10 s)
+REWINDBUDGET = 8 * 1024 * 1024  # most bytes a RewindBuffer keeps
+KEYFRAMEEVERY = 30   # ticks between keyframes, the ticks between are deltas
+COMPRESSLEVEL = 1    # zlib level, fast since a frame is saved every tick
+
+# magic, version, tick, flags (FLAGS bits), invulnerable, game over and
+# win start ticks, enemy frame, enemies spawned, enemy count
+HEADER = struct.Struct('<4sHIBiiiIII')
+FLAGS = ('invulnerableMode', 'gameOverMode', 'winMode', 'moved', 'done',
+         'numpy')
+PLAYERFIELDS = ('x', 'y', 'lastx', 'lasty', 'vx', 'vy', 'accx', 'accy',
+                'size', 'health')
+CAMERAFIELDS = ('x', 'y', 'lastx', 'lasty', 'zoom')
+# enemy columns and their array typecodes, stored one column at a time
+ENEMYCOLUMNS = (('x', 'd'), ('y', 'd'), ('lastx', 'd'), ('lasty', 'd'),
+                ('vx', 'd'), ('vy', 'd'), ('ints', 'B'), ('size', 'I'),
+                ('flags', 'B'), ('lodphase', 'I'), ('lodinterval', 'B'),
+                ('lastmove', 'I'))
+ENEMYBLOCK = 32      # enemy columns are padded to a multiple of this many
+#                      rows, so states only change size now and then
+SHARKBIT, RIGHTBIT, DEADBIT = 1, 2, 4  # enemy flags
+DTYPES = {'d': '<f8', 'I': '<u4', 'B': '<u1', 'Q': '<u8'}  # for School
+
+
+def _numbers(values):
+    """Returns values as an array of doubles and a bit mask of the ones
+    that were ints, so they come back as ints
+    """
+    mask = 0
+    for i, value in enumerate(values):
+        if isinstance(value, int):
+            mask |= 1 << i
+    return array('d', values), mask
+
+
+def _fromNumbers(doubles, mask):
+    """Undoes _numbers"""
+    return [int(value) if mask >> i & 1 else value
+            for i, value in enumerate(doubles)]
+
+
+def _pack(values):
+    """Returns an array as little endian bytes"""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack(data, offset, typecode, count):
+    """Returns the array of count typecode items packed at offset in
+    data and the offset after it
+    """
+    values = array(typecode)
+    end = offset + values.itemsize * count
+    values.frombytes(data[offset:end])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values, end
+
+
+def encodeWorld(world):
+    """Returns the state of world as bytes
+
+    Everything that changes as the game is played is saved: the player,
+    camera, enemies, mode timers and random number generators. The
+    settings, inputs and sprites are not.
+    """
+    player, camera, enemies = world.player, world.camera, world.enemies
+    if world.chunks is not None:
+        raise ValueError('states of STREAMCHUNKS worlds are not supported')
+    numpy = isinstance(enemies, School)
+    flags = 0
+    for bit, name in enumerate(FLAGS[:-1]):
+        flags |= bool(getattr(world, name)) << bit
+    flags |= numpy << (len(FLAGS) - 1)
+    count = enemies.n if numpy else len(enemies)
+    parts = [HEADER.pack(MAGIC, STATEVERSION, world.tick, flags,
+                         world.invulnerableStartTick, world.gameOverStartTick,
+                         world.winStartTick, enemies.frame, enemies.spawned,
+                         count)]
+
+    values, ints = _numbers([getattr(player, name)
+                             for name in PLAYERFIELDS])
+    values.append(player.facing == 'right')
+    parts += [struct.pack('<I', ints), _pack(values)]
+    values, ints = _numbers([getattr(camera, name)
+                             for name in CAMERAFIELDS])
+    parts += [struct.pack('<I', ints), _pack(values)]
+
+    _, words, gauss = world.rng.getstate()
+    parts += [_pack(array('I', words)),
+              _pack(array('d', [float('nan') if gauss is None else gauss]))]
+
+    if numpy:
+        parts += _encodeSchool(enemies)
+    else:
+        parts += _encodeGroup(enemies)
+    return b''.join(parts)
+
+
+def _encodeGroup(group):
+    """Returns the column bytes of an EnemyGroup's enemies"""
+    columns = dict((name, array(typecode)) for name, typecode in ENEMYCOLUMNS)
+    for enemy in group:
+        position, ints = _numbers((enemy.x, enemy.y, enemy.lastx,
+                                   enemy.lasty, enemy.vx, enemy.vy))
+        for name, value in zip(('x', 'y', 'lastx', 'lasty', 'vx', 'vy'),
+                               position):
+            columns[name].append(value)
+        columns['ints'].append(ints)
+        columns['size'].append(enemy.size)
+        columns['flags'].append((SHARKBIT if enemy.etype == 'shark' else 0) |
+                                (RIGHTBIT if enemy.facing == 'right' else 0))
+        columns['lodphase'].append(enemy.lodphase)
+        columns['lodinterval'].append(enemy.lodinterval)
+        columns['lastmove'].append(enemy.lastmove)
+    padding = _padded(len(group)) - len(group)
+    for column in columns.values():
+        column.extend([0] * padding)
+    return [_pack(columns[name]) for name, _ in ENEMYCOLUMNS]
+
+
+def _padded(count):
+    """Returns count rounded up to a whole number of ENEMYBLOCKs"""
+    return -(-count // ENEMYBLOCK) * ENEMYBLOCK
+
+
+def _encodeSchool(school):
+    """Returns the column bytes of a School's enemies and its generator
+    state
+    """
+    n = school.n
+    flags = (school.shark[:n] * SHARKBIT | school.right[:n] * RIGHTBIT |
+             ~school.alive[:n] * DEADBIT)
+    columns = {'ints': np.zeros(n), 'flags': flags,
+               'lodinterval': np.ones(n)}
+    parts = []
+    padded = np.zeros(_padded(n))
+    for name, typecode in ENEMYCOLUMNS:
+        column = columns[name] if name in columns else getattr(school, name)
+        padded[:n] = column[:n]
+        parts.append(padded.astype(DTYPES[typecode]).tobytes())
+    state = school.rng.bit_generator.state
+    mask = (1 << 64) - 1
+    words = [state['state']['state'] & mask, state['state']['state'] >> 64,
+             state['state']['inc'] & mask, state['state']['inc'] >> 64,
+             state['has_uint32'], state['uinteger']]
+    parts.append(_pack(array('Q', words)))
+    return parts
+
+
+def decodeWorld(data):
+    """Returns the state in data as a dict of plain values, for
+    restoreWorld or for looking at
+    """
+    (magic, version, tick, flags, invulnerableStartTick, gameOverStartTick,
+     winStartTick, frame, spawned, count) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != STATEVERSION:
+        raise ValueError('not a version %d world state' % STATEVERSION)
+    state = dict((name, bool(flags >> bit & 1))
+                 for bit, name in enumerate(FLAGS))
+    state.update({'tick': tick,
+                  'invulnerableStartTick': invulnerableStartTick,
+                  'gameOverStartTick': gameOverStartTick,
+                  'winStartTick': winStartTick,
+                  'frame': frame, 'spawned': spawned})
+    offset = HEADER.size
+
+    ints, = struct.unpack_from('<I', data, offset)
+    values, offset = _unpack(data, offset + 4, 'd', len(PLAYERFIELDS) + 1)
+    state['player'] = dict(zip(PLAYERFIELDS, _fromNumbers(values[:-1], ints)))
+    state['player']['facing'] = 'right' if values[-1] else 'left'
+    ints, = struct.unpack_from('<I', data, offset)
+    values, offset = _unpack(data, offset + 4, 'd', len(CAMERAFIELDS))
+    state['camera'] = dict(zip(CAMERAFIELDS, _fromNumbers(values, ints)))
+
+    words, offset = _unpack(data, offset, 'I', 625)
+    gauss, offset = _unpack(data, offset, 'd', 1)
+    state['rng'] = (3, tuple(words),
+                    None if gauss[0] != gauss[0] else gauss[0])  # nan: None
+
+    columns = {}
+    for name, typecode in ENEMYCOLUMNS:
+        columns[name], offset = _unpack(data, offset, typecode,
+                                        _padded(count))
+        del columns[name][count:]
+    state['enemies'] = columns
+    state['schoolRng'] = None
+    if state['numpy']:
+        words, offset = _unpack(data, offset, 'Q', 6)
+        state['schoolRng'] = {
+            'bit_generator': 'PCG64',
+            'state': {'state': words[0] | words[1] << 64,
+                      'inc': words[2] | words[3] << 64},
+            'has_uint32': words[4], 'uinteger': words[5]}
+    return state
+
+
+def restoreWorld(world, data):
+    """Puts world back in the state encoded in data
+
+    world must use the same backend the state was saved from.
+    """
+    state = decodeWorld(data)
+    if state['numpy'] != isinstance(world.enemies, School):
+        raise ValueError('the state is from a World with the other backend')
+    for name in ('tick', 'invulnerableMode', 'invulnerableStartTick',
+                 'gameOverMode', 'gameOverStartTick', 'winMode',
+                 'winStartTick', 'moved', 'done'):
+        setattr(world, name, state[name])
+
+    player = world.player
+    for name, value in state['player'].items():
+        setattr(player, name, value)
+    player.colrect.update(player.x, player.y, player.size, player.size)
+    camera = world.camera
+    camera.setZoom(state['camera']['zoom'])
+    for name, value in state['camera'].items():
+        setattr(camera, name, value)
+
+    if state['numpy']:
+        _restoreSchool(world.enemies, state, player)
+    else:
+        _restoreGroup(world.enemies, state, player)
+    # last, EnemyGroup draws from it while refilling
+    world.rng.setstate(state['rng'])
+
+
+def _restoreGroup(group, state, player):
+    """Refills an EnemyGroup with the enemies in state"""
+    columns = state['enemies']
+    for enemy in group.enemies:
+        group.pool.release(enemy)
+    group.enemies = []
+    group.grid.clear()
+    group.numFish, group.numSharks = 0, 0
+    names = ('x', 'y', 'lastx', 'lasty', 'vx', 'vy')
+    for i in range(len(columns['size'])):
+        x, y, lastx, lasty, vx, vy = _fromNumbers(
+            [columns[name][i] for name in names], columns['ints'][i])
+        size, flags = columns['size'][i], columns['flags'][i]
+        if flags & SHARKBIT:
+            enemy = group.pool.shark(x, y, size, player)
+            group.numSharks += 1
+        else:
+            enemy = group.pool.fish(x, y, size, group.rng)
+            group.numFish += 1
+        enemy.lastx, enemy.lasty, enemy.vx, enemy.vy = lastx, lasty, vx, vy
+        enemy.facing = 'right' if flags & RIGHTBIT else 'left'
+        enemy.lodphase = columns['lodphase'][i]
+        enemy.lodinterval = columns['lodinterval'][i]
+        enemy.lastmove = columns['lastmove'][i]
+        group.enemies.append(enemy)
+        group.grid.update(enemy)
+    group.frame, group.spawned = state['frame'], state['spawned']
+
+
+def _restoreSchool(school, state, player):
+    """Refills a School with the enemies in state"""
+    columns = state['enemies']
+    n = len(columns['size'])
+    school.n = 0
+    school._reserve(n)
+    for name in ('x', 'y', 'lastx', 'lasty', 'vx', 'vy', 'size',
+                 'lodphase', 'lastmove'):
+        getattr(school, name)[:n] = np.asarray(columns[name])
+    flags = np.asarray(columns['flags'])
+    school.shark[:n] = flags & SHARKBIT != 0
+    school.right[:n] = flags & RIGHTBIT != 0
+    school.alive[:n] = flags & DEADBIT == 0
+    school.n = n
+    alive = school.alive[:n]
+    school.numSharks = int((school.shark[:n] & alive).sum())
+    school.numFish = int(alive.sum()) - school.numSharks
+    school.frame, school.spawned = state['frame'], state['spawned']
+    school.player = player
+    school.rng.bit_generator.state = state['schoolRng']
+
+
+class RewindBuffer(object):
+    """The last ticks of a World, to go back to any of them
+
+    Every tick is saved with encodeWorld and compressed. A keyframe is
+    kept whole every keyframeEvery ticks, and whenever the state changes
+    size (enemies come and go). The ticks after it keep only how they
+    differ from it, XORed so unchanged bytes compress to almost nothing,
+    so any tick is restored from at most two frames. Whole groups of a
+    keyframe and its deltas are dropped, oldest first, once they fall
+    more than ticks behind the newest or the buffer goes over budget.
+
+    Attributes:
+        ticks:          Ticks kept
+        budget:         Most bytes of frames kept
+        keyframeEvery:  Most ticks between keyframes
+        size:           Bytes of frames kept
+
+    Key Methods:
+        record:     Saves a World's current tick
+        restore:    Puts a World back to a saved tick, forgetting the
+                    ticks after it
+        back:       Restores the tick before the newest one
+        getTicks:   Returns the oldest and newest ticks kept
+    """
+
+    def __init__(self, ticks=REWINDTICKS, budget=REWINDBUDGET,
+                 keyframeEvery=KEYFRAMEEVERY):
+        if budget <= 0 or keyframeEvery <= 0:
+            raise ValueError('budget and keyframeEvery must be positive')
+        self.ticks = ticks
+        self.budget = budget
+        self.keyframeEvery = keyframeEvery
+        self.size = 0
+        # groups of [keyframe tick, compressed keyframe, [(tick,
+        # compressed delta)]], oldest first
+        self._groups = deque()
+        self._key = None  # uncompressed keyframe of the newest group
+
+    def __len__(self):
+        return sum(1 + len(group[2]) for group in self._groups)
+
+    def getTicks(self):
+        """Returns the oldest and newest ticks kept, None if empty"""
+        if not self._groups:
+            return None
+        last = self._groups[-1]
+        return (self._groups[0][0],
+                last[2][-1][0] if last[2] else last[0])
+
+    def record(self, world):
+        """Saves world's current tick"""
+        data = encodeWorld(world)
+        key = self._key
+        if (key is not None and len(key) == len(data) and
+                len(self._groups[-1][2]) < self.keyframeEvery - 1):
+            delta = zlib.compress(_xor(key, data), COMPRESSLEVEL)
+            # once the state drifts far from the keyframe (the random
+            # number generator refilled, enemies were reordered) a new
+            # keyframe makes the next deltas small again
+            if len(delta) * 2 < len(self._groups[-1][1]):
+                self._groups[-1][2].append((world.tick, delta))
+                self.size += len(delta)
+                self._trim(world.tick)
+                return
+        frame = zlib.compress(data, COMPRESSLEVEL)
+        self._groups.append([world.tick, frame, []])
+        self._key = data
+        self.size += len(frame)
+        self._trim(world.tick)
+
+    def _trim(self, newest):
+        """Drops the oldest groups too far behind or over budget,
+        always keeping the newest
+        """
+        while len(self._groups) > 1:
+            group = self._groups[0]
+            last = self._groups[1][0] - 1  # last tick in the oldest group
+            if last >= newest - self.ticks and self.size <= self.budget:
+                break
+            self._groups.popleft()
+            self.size -= len(group[1]) + sum(len(delta)
+                                             for _, delta in group[2])
+
+    def restore(self, world, tick):
+        """Puts world back to tick and forgets the ticks after it,
+        returns False (changing nothing) if tick isn't kept
+        """
+        for index in range(len(self._groups) - 1, -1, -1):
+            if self._groups[index][0] <= tick:
+                break
+        else:
+            return False
+        keytick, frame, deltas = self._groups[index]
+        key = zlib.decompress(frame)
+        data = key
+        if tick != keytick:
+            found = [delta for t, delta in deltas if t == tick]
+            if not found:
+                return False
+            data = _xor(key, zlib.decompress(found[0]))
+        restoreWorld(world, data)
+
+        # the game goes on from tick, the ticks after it never happen
+        while len(self._groups) > index + 1:
+            group = self._groups.pop()
+            self.size -= len(group[1]) + sum(len(d) for _, d in group[2])
+        while deltas and deltas[-1][0] > tick:
+            self.size -= len(deltas.pop()[1])
+        self._key = key
+        return True
+
+    def back(self, world):
+        """Restores the tick before the newest one kept, returns False
+        if there is none
+        """
+        ticks = self.getTicks()
+        if ticks is None or ticks[0] == ticks[1]:
+            return False
+        return self.restore(world, ticks[1] - 1)
+
+
+def _xor(first, second):
+    """Returns the bytes of first XOR second, which are the same length"""
+    length = len(first)
+    return (int.from_bytes(first, 'little') ^
+            int.from_bytes(second, 'little')).to_bytes(length, 'little')
+
+
+def describe(state):
+    """Returns a decoded state as readable text"""
+    lines = ['tick %d%s' % (state['tick'], ''.join(
+        ', %s' % name for name in ('invulnerableMode', 'gameOverMode',
+                                   'winMode', 'done') if state[name]))]
+    lines.append('player  ' + ' '.join('%s=%s' % (name, value) for name, value
+                                       in sorted(state['player'].items())))
+    lines.append('camera  ' + ' '.join('%s=%s' % (name, value) for name, value
+                                       in sorted(state['camera'].items())))
+    columns = state['enemies']
+    lines.append('%d enemies (%s backend), frame %d, %d spawned'
+                 % (len(columns['size']),
+                    'numpy' if state['numpy'] else 'objects',
+                    state['frame'], state['spawned']))
+    for i in range(len(columns['size'])):
+        flags = columns['flags'][i]
+        lines.append('  %-5s %9.2f %9.2f  v %6.2f %6.2f  size %3d  %s%s'
+                     % ('shark' if flags & SHARKBIT else 'fish',
+                        columns['x'][i], columns['y'][i], columns['vx'][i],
+                        columns['vy'][i], columns['size'][i],
+                        'right' if flags & RIGHTBIT else 'left',
+                        ' dead' if flags & DEADBIT else ''))
+    return '\n'.join(lines)
+
+
+def main():
+    """Prints the world state saved in a file"""
+    parser = argparse.ArgumentParser(
+        description='Show a saved Fishy world state')
+    parser.add_argument('file', help='state written by encodeWorld, e.g. '
+                                     'with headless.py --dump')
+    args = parser.parse_args()
+    with open(args.file, 'rb') as f:
+        print(describe(decodeWorld(f.read())))
+
+
+if __name__ == '__main__':
+    main()
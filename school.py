@@ -0,0 +1,391 @@
+from collections import namedtuple
+import pygame
+from fish import (FISH_SPRITE, SHARK_SPRITE,
+                  MINSPEED, MAXSPEED, DIRCHANGEFREQ, SHARKSPEED)
+from lod import gapsOutside, isDue, updateIntervals
+from sprites import SPRITES
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only School needs it
+    np = None
+
+# an enemy the player ran into, stands in for the fish object
+SchoolHit = namedtuple('SchoolHit', 'index size etype')
+
+
+class School(object):
+    """Every enemy fish and shark stored as a structure of NumPy arrays
+
+    Drop-in replacement for game.EnemyGroup that moves, culls and
+    collides all enemies with batched array operations instead of a
+    Python method call per fish. Follows the same rules as EnemyFish
+    and Shark, but draws its random numbers from its own generator.
+
+    Attributes:
+        x, y:               Absolute positions of the fish
+        lastx, lasty:       Positions before the fish last moved
+        vx, vy:             Velocity components of the fish
+        size:               Sidelength sizes of the square fish
+        shark:              True where the fish is a Shark
+        right:              True where the fish faces right
+        alive:              False where a fish was eaten this frame
+        lodphase:           Which frames each fish moves on when far away
+        lastmove:           Frame each fish last moved on
+        numFish, numSharks: How many of each enemy type are active
+        dirChangeFreq:      % chance per frame a fish changes direction
+        sharkSpeed:         Speed sharks move towards the player
+
+    Key Methods:
+        spawnFish, spawnShark:  Adds an enemy
+        spawnFishBatch:         Adds many EnemyFish at once
+        addFish:                Adds EnemyFish with given velocities
+        takeFishOutside:        Removes and returns the EnemyFish
+                                outside a rectangle
+        move:                   Moves every enemy one frame
+        cull:                   Removes enemies outside the active area
+        collide:                Returns the enemies touching the player
+        remove:                 Removes an enemy the player ate
+        getState:               Returns every enemy's type, position,
+                                velocity and size
+        getDrawState:           Returns what drawing needs of every enemy
+        getDrawList:            Returns every live enemy's draw list entry
+    """
+
+    def __init__(self, seed=None, capacity=64, dirChangeFreq=DIRCHANGEFREQ,
+                 sharkSpeed=SHARKSPEED):
+        if np is None:
+            raise ImportError('School needs NumPy, install it or use '
+                              'the object backend')
+        self.rng = np.random.default_rng(seed)
+        self.n = 0  # used length of the arrays
+        self.numFish, self.numSharks = 0, 0
+        self.dirChangeFreq = dirChangeFreq
+        self.sharkSpeed = sharkSpeed
+        self.player = None  # the player sharks move towards
+        self.frame = 0      # frames moved so far
+        self.spawned = 0    # enemies added so far, for lodphase
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.lastx = np.zeros(capacity)
+        self.lasty = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.size = np.zeros(capacity, dtype=np.int64)
+        self.shark = np.zeros(capacity, dtype=bool)
+        self.right = np.zeros(capacity, dtype=bool)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.lodphase = np.zeros(capacity, dtype=np.int64)
+        self.lastmove = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self.numFish + self.numSharks
+
+    def _arrays(self):
+        return ('x', 'y', 'lastx', 'lasty', 'vx', 'vy', 'size', 'shark',
+                'right', 'alive', 'lodphase', 'lastmove')
+
+    def _reserve(self, count):
+        """Grows the arrays if count more enemies don't fit"""
+        capacity = len(self.x)
+        if self.n + count <= capacity:
+            return
+        while capacity < self.n + count:
+            capacity *= 2
+        for name in self._arrays():
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def _append(self, x, y, size, shark):
+        """Adds one enemy at the end of the arrays, growing them if full"""
+        self._reserve(1)
+        i = self.n
+        self.x[i], self.y[i] = x, y
+        self.lastx[i], self.lasty[i] = x, y
+        self.vx[i], self.vy[i] = 0, 0
+        self.size[i] = size
+        self.shark[i] = shark
+        self.right[i] = False
+        self.alive[i] = True
+        self._schedule(slice(i, i + 1))
+        self.n += 1
+        return i
+
+    def _schedule(self, new):
+        """Gives the enemies in slice new their lodphase and lastmove"""
+        count = new.stop - new.start
+        self.lodphase[new] = np.arange(self.spawned, self.spawned + count)
+        self.lastmove[new] = self.frame
+        self.spawned += count
+
+    def _randomVelocities(self, count):
+        """Returns count random velocities like EnemyFish uses"""
+        speeds = self.rng.integers(MINSPEED, MAXSPEED + 1, size=(2, count))
+        signs = self.rng.integers(0, 2, size=(2, count)) * 2 - 1
+        return speeds * signs
+
+    def spawnFish(self, x, y, size):
+        """Adds an EnemyFish with a random starting velocity"""
+        i = self._append(x, y, size, False)
+        self.vx[i], self.vy[i] = self._randomVelocities(1)[:, 0]
+        self.numFish += 1
+
+    def spawnFishBatch(self, positions, sizes):
+        """Adds an EnemyFish at each x, y in positions with the matching
+        size in sizes, filling the arrays in one go
+        """
+        count = len(sizes)
+        if count == 0:
+            return
+        self._reserve(count)
+        new = slice(self.n, self.n + count)
+        self.x[new], self.y[new] = np.array(positions, dtype=float).T
+        self.lastx[new], self.lasty[new] = self.x[new], self.y[new]
+        self.vx[new], self.vy[new] = self._randomVelocities(count)
+        self.size[new] = sizes
+        self.shark[new] = False
+        self.right[new] = False
+        self.alive[new] = True
+        self._schedule(new)
+        self.n += count
+        self.numFish += count
+
+    def spawnShark(self, x, y, size, player):
+        """Adds a Shark that moves towards player"""
+        self._append(x, y, size, True)
+        self.player = player
+        self.numSharks += 1
+
+    def move(self, view=None):
+        """Moves every enemy one frame (see EnemyFish.move, Shark.move)
+
+        If the camera view is given, EnemyFish far outside it only move
+        every few frames, catching up on the frames they skipped (see
+        lod.py). Sharks always move.
+        """
+        self.frame += 1
+        n = self.n
+        if n == 0:
+            return
+        shark = self.shark[:n]
+        self.lastx[:n] = self.x[:n]
+        self.lasty[:n] = self.y[:n]
+
+        if view is None:
+            due = np.ones(n, dtype=bool)
+        else:
+            gaps = gapsOutside(np.trunc(self.x[:n]), np.trunc(self.y[:n]),
+                               self.size[:n], view)
+            intervals = updateIntervals(gaps)
+            intervals[shark] = 1
+            due = isDue(self.frame, self.lodphase[:n], intervals)
+        steps = np.where(due, self.frame - self.lastmove[:n], 0)
+        self.lastmove[:n][due] = self.frame
+
+        # random chance fish change direction, scaled by frames moved
+        change = ((self.rng.integers(0, 100, size=n) <
+                   self.dirChangeFreq * steps) & due & ~shark)
+        count = int(change.sum())
+        if count:
+            self.vx[:n][change], self.vy[:n][change] = \
+                self._randomVelocities(count)
+
+        # sharks head for the player center, no faster than sharkSpeed
+        if self.player is not None and shark.any():
+            half = self.size[:n][shark] / 2
+            player = self.player
+            xdiff = (player.x + player.size / 2) - (self.x[:n][shark] + half)
+            ydiff = (player.y + player.size / 2) - (self.y[:n][shark] + half)
+            speed = self.sharkSpeed
+            self.vx[:n][shark] = np.clip(xdiff, -speed, speed)
+            self.vy[:n][shark] = np.clip(ydiff, -speed, speed)
+
+        self.x[:n] += self.vx[:n] * steps
+        self.y[:n] += self.vy[:n] * steps
+        self.right[:n] = self.vx[:n] > 0
+        self._separateSharks()
+
+    def _separateSharks(self):
+        """Pushes overlapping sharks apart (see Shark.separate)"""
+        sharks = np.flatnonzero(self.shark[:self.n] & self.alive[:self.n])
+        for i in sharks:
+            for j in sharks:
+                rect, other = self._rect(i), self._rect(j)
+                if i == j or not rect.colliderect(other):
+                    continue
+                overlap = rect.clip(other)
+                if overlap.width < overlap.height:
+                    shift = overlap.width / 2
+                    if rect.centerx < other.centerx:
+                        shift *= -1
+                    self.x[i] += shift
+                    self.x[j] -= shift
+                else:
+                    shift = overlap.height / 2
+                    if rect.centery < other.centery:
+                        shift *= -1
+                    self.y[i] += shift
+                    self.y[j] -= shift
+
+    def _rect(self, i):
+        """Returns the collision rect of enemy i"""
+        return pygame.Rect(self.x[i], self.y[i], self.size[i], self.size[i])
+
+    def _overlaps(self, rect):
+        """Returns a mask of enemies whose colrect collides with rect
+
+        Matches pygame.Rect.colliderect, including truncating positions
+        toward zero the way the Rect constructor does.
+        """
+        n = self.n
+        left = np.trunc(self.x[:n])
+        top = np.trunc(self.y[:n])
+        size = self.size[:n]
+        return ((left < rect.right) & (rect.left < left + size) &
+                (top < rect.bottom) & (rect.top < top + size))
+
+    def cull(self, camera, etype=None):
+        """Removes enemies (only of etype if given) outside the camera's
+        active area, returns how many
+        """
+        n = self.n
+        gone = self.alive[:n] & ~self._overlaps(camera.getActiveArea())
+        if etype == 'shark':
+            gone &= self.shark[:n]
+        elif etype == 'fish':
+            gone &= ~self.shark[:n]
+        culledSharks = int((gone & self.shark[:n]).sum())
+        self.numSharks -= culledSharks
+        self.numFish -= int(gone.sum()) - culledSharks
+        self._compact(self.alive[:n] & ~gone)
+        return int(gone.sum())
+
+    def _compact(self, keep):
+        """Keeps only the enemies where keep is True, moving them to
+        the front so live enemies stay contiguous
+        """
+        n = self.n
+        kept = int(keep.sum())
+        for name in self._arrays():
+            array = getattr(self, name)
+            array[:kept] = array[:n][keep]
+        self.n = kept
+
+    def addFish(self, states):
+        """Adds an EnemyFish for each (x, y, vx, vy, size) in states"""
+        count = len(states)
+        if count == 0:
+            return
+        self._reserve(count)
+        new = slice(self.n, self.n + count)
+        (self.x[new], self.y[new], self.vx[new], self.vy[new],
+         self.size[new]) = np.array(states, dtype=float).T
+        self.lastx[new], self.lasty[new] = self.x[new], self.y[new]
+        self.shark[new] = False
+        self.right[new] = False
+        self.alive[new] = True
+        self._schedule(new)
+        self.n += count
+        self.numFish += count
+
+    def takeFishOutside(self, rect):
+        """Removes the EnemyFish whose position is outside rect, returns
+        their (x, y, vx, vy, size)
+        """
+        n = self.n
+        x, y = np.trunc(self.x[:n]), np.trunc(self.y[:n])
+        inside = ((rect.left <= x) & (x < rect.right) &
+                  (rect.top <= y) & (y < rect.bottom))
+        gone = self.alive[:n] & ~self.shark[:n] & ~inside
+        states = list(zip(self.x[:n][gone].tolist(),
+                          self.y[:n][gone].tolist(),
+                          self.vx[:n][gone].tolist(),
+                          self.vy[:n][gone].tolist(),
+                          self.size[:n][gone].tolist()))
+        self.numFish -= len(states)
+        self._compact(~gone)
+        return states
+
+    def collide(self, player, pixels=False):
+        """Returns a SchoolHit for each enemy touching the player
+
+        With pixels, only those whose opaque pixels also overlap the
+        player's, checked just for the few rects that touch
+        """
+        n = self.n
+        hits = np.flatnonzero(self.alive[:n] & self._overlaps(player.colrect))
+        if pixels and len(hits):
+            mine = (player.sprite, player.size, player.facing,
+                    player.colrect.x, player.colrect.y)
+            hits = [i for i in hits if SPRITES.overlap(
+                mine, (SHARK_SPRITE if self.shark[i] else FISH_SPRITE,
+                       int(self.size[i]),
+                       'right' if self.right[i] else 'left',
+                       int(self.x[i]), int(self.y[i])))]
+        return [SchoolHit(int(i), int(self.size[i]),
+                          'shark' if self.shark[i] else 'fish')
+                for i in hits]
+
+    def remove(self, hit):
+        """Removes an enemy returned by collide
+
+        The slot is only marked dead here so indices in other hits stay
+        valid, the next cull compacts it away.
+        """
+        self.alive[hit.index] = False
+        if hit.etype == 'shark':
+            self.numSharks -= 1
+        else:
+            self.numFish -= 1
+
+    def getState(self):
+        """Returns (etype, x, y, vx, vy, size) for every live enemy"""
+        n = self.n
+        return [('shark' if shark else 'fish', x, y, vx, vy, size)
+                for x, y, vx, vy, size, shark, alive in zip(
+                    self.x[:n].tolist(), self.y[:n].tolist(),
+                    self.vx[:n].tolist(), self.vy[:n].tolist(),
+                    self.size[:n].tolist(), self.shark[:n].tolist(),
+                    self.alive[:n].tolist())
+                if alive]
+
+    def getDrawState(self):
+        """Returns (sprite, x, y, lastx, lasty, size, facing) for every
+        live enemy, enough to draw them later
+        """
+        n = self.n
+        return [(SHARK_SPRITE if shark else FISH_SPRITE, x, y, lastx, lasty,
+                 size, 'right' if right else 'left')
+                for x, y, lastx, lasty, size, shark, right, alive in zip(
+                    self.x[:n].tolist(), self.y[:n].tolist(),
+                    self.lastx[:n].tolist(), self.lasty[:n].tolist(),
+                    self.size[:n].tolist(), self.shark[:n].tolist(),
+                    self.right[:n].tolist(), self.alive[:n].tolist())
+                if alive]
+
+    def getDrawList(self, camera, alpha=1.0):
+        """Returns (size, sprite, facing, left, top) in screen pixels
+        for every live enemy (see Fish.getDrawItem), including those
+        off the screen (blitBySize leaves them out)
+
+        alpha below 1 places them that far between where they were
+        before they last moved (0) and where they are now (1)
+        """
+        n = self.n
+        x, y = self.x[:n], self.y[:n]
+        if alpha != 1:
+            back = 1 - alpha
+            x = x - (x - self.lastx[:n]) * back
+            y = y - (y - self.lasty[:n]) * back
+        camerax, cameray = camera.getPosition(alpha)
+        left = np.trunc(x - camerax).astype(int)
+        top = np.trunc(y - cameray).astype(int)
+        size = self.size[:n]
+        shown = self.alive[:n]
+        sprites = np.where(self.shark[:n][shown], SHARK_SPRITE, FISH_SPRITE)
+        facings = np.where(self.right[:n][shown], 'right', 'left')
+        return list(zip(size[shown].tolist(), sprites.tolist(),
+                        facings.tolist(), left[shown].tolist(),
+                        top[shown].tolist()))
@@ -0,0 +1,88 @@
+# Constants
+CELLSIZE = 128  # sidelength of a grid cell in pixels
+
+
+class SpatialHash(object):
+    """Uniform grid that buckets fish by the cells their colrect covers
+
+    Fish are only moved between buckets when they cross a cell edge, so
+    keeping the grid current after every Fish.move is cheap. Buckets are
+    insertion-ordered dicts rather than sets so queries return fish in a
+    repeatable order.
+
+    Attributes:
+        cellsize:   Sidelength of a grid cell in pixels
+
+    Key Methods:
+        update: Adds a fish or moves it to the cells it now covers
+        remove: Takes a fish out of the grid
+        near:   Returns the fish sharing a cell with a rectangle
+    """
+
+    def __init__(self, cellsize=CELLSIZE):
+        if cellsize <= 0:
+            raise ValueError('cellsize must be positive')
+        self.cellsize = cellsize
+        self._buckets = {}  # cell -> {fish: None}
+        self._spans = {}    # fish -> cells covered as (x0, y0, x1, y1)
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __contains__(self, fish):
+        return fish in self._spans
+
+    def _span(self, rect):
+        """Returns the range of cells a rectangle covers"""
+        cs = self.cellsize
+        return (rect.left // cs, rect.top // cs,
+                (rect.right - 1) // cs, (rect.bottom - 1) // cs)
+
+    def _cells(self, span):
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                yield cx, cy
+
+    def update(self, fish):
+        """Adds fish to the grid or moves it if it crossed a cell edge"""
+        span = self._span(fish.colrect)
+        old = self._spans.get(fish)
+        if span == old:
+            return
+        if old is not None:
+            self._unlink(fish, old)
+        self._spans[fish] = span
+        for cell in self._cells(span):
+            self._buckets.setdefault(cell, {})[fish] = None
+
+    def remove(self, fish):
+        """Takes fish out of the grid (does nothing if it isn't there)"""
+        old = self._spans.pop(fish, None)
+        if old is not None:
+            self._unlink(fish, old)
+
+    def _unlink(self, fish, span):
+        for cell in self._cells(span):
+            bucket = self._buckets[cell]
+            del bucket[fish]
+            if not bucket:
+                del self._buckets[cell]
+
+    def near(self, rect):
+        """Returns the fish in the cells rect covers
+
+        These are candidates only, callers still need an exact test
+        such as colliderect.
+        """
+        found = {}
+        for cell in self._cells(self._span(rect)):
+            bucket = self._buckets.get(cell)
+            if bucket:
+                found.update(bucket)
+        return list(found)
+
+    def clear(self):
+        """Removes every fish from the grid"""
+        self._buckets.clear()
+        self._spans.clear()
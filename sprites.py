@@ -0,0 +1,183 @@
+import os
+import pygame
+from collections import OrderedDict
+from operator import itemgetter
+
+# Constants
+IMGDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'img')
+SPRITECACHESIZE = 512  # most scaled sprites kept before evicting the oldest
+
+
+def imagePath(filename):
+    """Returns the path of an image file in the img folder"""
+    return os.path.join(IMGDIR, filename)
+
+
+class Sprite(object):
+    """Left and right facing versions of an image, loaded on first use
+
+    Once a display exists the images are converted to its pixel format
+    so blitting them doesn't convert every pixel every time.
+
+    Attributes:
+        filename:   Image file in the img folder
+        faces:      Which way the fish in the image file faces
+        converted:  If the images are in the display's pixel format
+
+    Key Methods:
+        image:      Returns the image facing left or right
+        convert:    Converts loaded images to the display's format
+    """
+
+    def __init__(self, filename, faces):
+        if faces not in ('left', 'right'):
+            raise ValueError('faces must be "left" or "right"')
+        self.filename, self.faces = filename, faces
+        self.converted = False
+        self._images = None  # facing -> Surface, once loaded
+        ALLSPRITES.append(self)
+
+    def image(self, facing):
+        """Returns the image facing left or right, loading it if needed"""
+        if self._images is None:
+            self._load()
+        return self._images[facing]
+
+    def _load(self):
+        """Loads the image file and flips it for the other facing"""
+        image = pygame.image.load(imagePath(self.filename))
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()
+            self.converted = True
+        flipped = pygame.transform.flip(image, True, False)
+        other = 'right' if self.faces == 'left' else 'left'
+        self._images = {self.faces: image, other: flipped}
+
+    def convert(self):
+        """Converts the images to the display's pixel format if they
+        were loaded before the display was set up
+        """
+        if self._images is None or self.converted:
+            return
+        for facing, image in self._images.items():
+            self._images[facing] = image.convert_alpha()
+        self.converted = True
+
+
+class SpriteCache(object):
+    """Shared cache of scaled fish images and their collision masks
+
+    Scaling a sprite is the most expensive part of moving a fish, so each
+    (sprite, size, facing) combination is scaled once and reused until
+    it falls out of the cache. Masks of the opaque pixels are cached the
+    same way, separately, so collisions never touch the images being
+    drawn.
+
+    Attributes:
+        maxsize:        Most scaled images (and masks) kept before evicting
+        hits, misses:   Image lookup counters for tuning maxsize
+
+    Key Methods:
+        get:        Returns the scaled image for a fish
+        getMask:    Returns the mask of a fish's opaque pixels
+        overlap:    Returns if the opaque pixels of two fish overlap
+        clear:      Empties the cache and resets the counters
+    """
+
+    def __init__(self, maxsize=SPRITECACHESIZE):
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+        self.maxsize = maxsize
+        self.hits, self.misses = 0, 0
+        self._images = OrderedDict()
+        self._masks = OrderedDict()
+
+    def __len__(self):
+        return len(self._images)
+
+    def get(self, sprite, size, facing):
+        """Returns sprite's image facing left or right scaled to
+        size x size
+        """
+        key = (sprite, size, facing)
+        image = self._images.get(key)
+        if image is not None:
+            self.hits += 1
+            self._images.move_to_end(key)  # mark as most recently used
+            return image
+
+        self.misses += 1
+        image = pygame.transform.scale(sprite.image(facing), (size, size))
+        self._images[key] = image
+        if len(self._images) > self.maxsize:
+            self._images.popitem(last=False)  # evict least recently used
+        return image
+
+    def getMask(self, sprite, size, facing):
+        """Returns a pygame.mask.Mask of the opaque pixels of sprite's
+        image facing left or right scaled to size x size
+        """
+        key = (sprite, size, facing)
+        mask = self._masks.get(key)
+        if mask is not None:
+            self._masks.move_to_end(key)
+            return mask
+
+        # scaled here rather than taken from get so the simulation never
+        # changes the image cache (it may run on another thread)
+        image = pygame.transform.scale(sprite.image(facing), (size, size))
+        mask = pygame.mask.from_surface(image)
+        self._masks[key] = mask
+        if len(self._masks) > self.maxsize:
+            self._masks.popitem(last=False)
+        return mask
+
+    def overlap(self, first, second):
+        """Returns if the opaque pixels of two fish overlap, each given
+        as (sprite, size, facing, left, top) with left and top in whole
+        pixels
+        """
+        mask = self.getMask(first[0], first[1], first[2])
+        other = self.getMask(second[0], second[1], second[2])
+        offset = (second[3] - first[3], second[4] - first[4])
+        return mask.overlap(other, offset) is not None
+
+    def clear(self):
+        """Empties the cache and resets the counters"""
+        self._images.clear()
+        self._masks.clear()
+        self.hits, self.misses = 0, 0
+
+
+def convertSprites():
+    """Converts every loaded Sprite to the display's pixel format
+
+    Call after pygame.display.set_mode. Scaled images made from the
+    unconverted sprites are dropped from the cache.
+    """
+    for sprite in ALLSPRITES:
+        sprite.convert()
+    SPRITES.clear()
+
+
+def blitBySize(screen, fish):
+    """Draws fish, a draw list of (size, sprite, facing, left, top) with
+    left, top in whole screen pixels, in a single Surface.blits call,
+    returns the areas of the screen drawn on
+
+    Smaller fish are drawn first so bigger ones end up on top, fish the
+    same size keep their order in the list. Fish entirely off the
+    screen are left out.
+    """
+    width, height = screen.get_size()
+    visible = [item for item in fish
+               if -item[0] < item[3] < width and -item[0] < item[4] < height]
+    visible.sort(key=itemgetter(0))
+    get = SPRITES.get
+    return screen.blits([(get(sprite, size, facing), (left, top))
+                         for size, sprite, facing, left, top in visible])
+
+
+ALLSPRITES = []  # every Sprite made, for convertSprites
+# cache shared by every fish
+SPRITES = SpriteCache()
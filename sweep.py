@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+import argparse
+import csv
+import itertools
+import math
+import multiprocessing
+import sys
+import time
+import pygame
+from pygame.locals import KEYDOWN, KEYUP, K_UP, K_DOWN, K_LEFT, K_RIGHT
+import game
+from game import Settings, World
+from headless import RandomInput
+
+# command line names of the Settings a sweep can vary
+SWEEPABLE = {'NUMENEMYFISH': 'numEnemyFish',
+             'NUMSHARKS': 'numSharks',
+             'WINSIZE': 'winSize',
+             'INVULNTIME': 'invulnTime',
+             'SHARKSPEED': 'sharkSpeed',
+             'DIRCHANGEFREQ': 'dirChangeFreq'}
+MAXTICKS = 9000   # ticks before an unfinished game stops (5 min at 30 FPS)
+THINKFREQ = 3     # ticks between the bot's decisions
+DANGERDIST = 100  # gap in pixels at which the bot flees a bigger enemy
+DEADZONE = 8      # distance in pixels the bot doesn't bother closing
+COLUMNS = ('games', 'win_rate', 'loss_rate', 'time_to_win_s', 'damage',
+           'ticks_per_s')
+
+
+class BotInput(object):
+    """Input source that plays like a simple greedy player
+
+    Flees the closest enemy it can't eat when one gets near, otherwise
+    chases the closest fish it can eat, pressing and releasing the arrow
+    keys to head that way.
+
+    Attributes:
+        world:      The World being played, set once it exists
+        thinkfreq:  Ticks between decisions
+        held:       Arrow key held for each axis ('x', 'y'), or None
+        tick:       How many times get() has been called
+    """
+
+    def __init__(self, world=None, thinkfreq=THINKFREQ):
+        self.world = world
+        self.thinkfreq = thinkfreq
+        self.held = {'x': None, 'y': None}
+        self.tick = 0
+
+    def get(self):
+        """Returns the key events for the next tick"""
+        self.tick += 1
+        if self.world is None or self.tick % self.thinkfreq:
+            return []
+        dx, dy = self._heading()
+        wanted = {'x': K_LEFT if dx < -DEADZONE else
+                  K_RIGHT if dx > DEADZONE else None,
+                  'y': K_UP if dy < -DEADZONE else
+                  K_DOWN if dy > DEADZONE else None}
+        events = []
+        for axis in ('x', 'y'):
+            held, want = self.held[axis], wanted[axis]
+            if held == want:
+                continue
+            if held is not None:
+                events.append(pygame.event.Event(KEYUP, key=held))
+            if want is not None:
+                events.append(pygame.event.Event(KEYDOWN, key=want))
+            self.held[axis] = want
+        return events
+
+    def _heading(self):
+        """Returns the direction the bot wants to go in as dx, dy"""
+        player = self.world.player
+        half = player.size / 2
+        px, py = player.x + half, player.y + half
+        prey, threat = None, None
+        for etype, x, y, vx, vy, size in self.world.enemies.getState():
+            cx, cy = x + size / 2, y + size / 2
+            dist = math.hypot(cx - px, cy - py)
+            if etype == 'fish' and size < player.size:
+                if prey is None or dist < prey[0]:
+                    prey = (dist, cx, cy)
+            elif dist - (size / 2 + half) < DANGERDIST:
+                if threat is None or dist < threat[0]:
+                    threat = (dist, cx, cy)
+        if threat is not None:
+            return px - threat[1], py - threat[2]
+        if prey is not None:
+            return prey[1] - px, prey[2] - py
+        return 0, 0
+
+
+def playGame(job):
+    """Plays one game without a window until it is won, lost or
+    maxTicks pass, returns its results as a dict
+
+    job is (params, seed, player, backend, maxTicks) where params are
+    keyword arguments for Settings and player is 'bot' or 'random'.
+    """
+    params, seed, player, backend, maxTicks = job
+    inputs = BotInput() if player == 'bot' else RandomInput(seed)
+    world = World(seed, inputs, backend, settings=Settings(**params))
+    inputs.world = world
+    health = world.player.health
+    startTime = time.perf_counter()
+    while (not world.winMode and not world.gameOverMode and
+           world.tick < maxTicks):
+        world.step()
+    elapsed = time.perf_counter() - startTime
+
+    winTime = None
+    if world.winMode:
+        winTime = (world.winStartTick - game.TEXTTIME * game.FPS) / game.FPS
+    return {'params': params,
+            'seed': seed,
+            'won': world.winMode,
+            'lost': world.gameOverMode,
+            'win_time': winTime,
+            'damage': health - world.player.health,
+            'ticks': world.tick,
+            'seconds': elapsed}
+
+
+def parseGrid(specs):
+    """Returns a list of Settings keyword argument dicts, one for every
+    combination of the NAME=value,value,... specs
+    """
+    names, choices = [], []
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if name.upper() not in SWEEPABLE or not values:
+            raise ValueError('expected NAME=value,... with NAME one of %s, '
+                             'got %r' % (', '.join(sorted(SWEEPABLE)), spec))
+        names.append(SWEEPABLE[name.upper()])
+        choices.append([_number(value) for value in values.split(',')])
+    return [dict(zip(names, combo)) for combo in itertools.product(*choices)]
+
+
+def _number(text):
+    """Returns text as an int, or a float if it isn't one"""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def sweep(grid, games, player='bot', backend=None, maxTicks=MAXTICKS,
+          seed=0, processes=None):
+    """Plays games games for every Settings keyword dict in grid over a
+    pool of processes (one per core by default), returns the results
+    of each game
+
+    Every dict plays the same seeds so they face the same oceans.
+    """
+    jobs = [(params, seed + i, player, backend, maxTicks)
+            for params in grid for i in range(games)]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(playGame, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def summarize(results):
+    """Returns a row per Settings in results, in the order they first
+    appear, with the params and the COLUMNS aggregated over its games
+    """
+    groups = {}
+    for result in results:
+        key = tuple(sorted(result['params'].items()))
+        groups.setdefault(key, []).append(result)
+    rows = []
+    for group in groups.values():
+        count = len(group)
+        winTimes = [r['win_time'] for r in group if r['won']]
+        seconds = sum(r['seconds'] for r in group)
+        row = dict(group[0]['params'])
+        row.update({
+            'games': count,
+            'win_rate': len(winTimes) / float(count),
+            'loss_rate': sum(r['lost'] for r in group) / float(count),
+            'time_to_win_s': (sum(winTimes) / len(winTimes)
+                              if winTimes else None),
+            'damage': sum(r['damage'] for r in group) / float(count),
+            'ticks_per_s': (sum(r['ticks'] for r in group) / seconds
+                            if seconds > 0 else 0.0)})
+        rows.append(row)
+    return rows
+
+
+def formatTable(rows, names):
+    """Returns rows as a plain text table, the params in names first"""
+    header = list(names) + list(COLUMNS)
+    lines = [[_format(row[column]) for column in header] for row in rows]
+    widths = [max([len(column)] + [len(line[i]) for line in lines])
+              for i, column in enumerate(header)]
+    return '\n'.join('  '.join(cell.rjust(width)
+                               for cell, width in zip(line, widths))
+                     for line in [header] + lines)
+
+
+def _format(value):
+    """Formats a table cell"""
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return '%.2f' % value
+    return str(value)
+
+
+def main():
+    """Sweeps a grid of difficulty settings and prints a results table"""
+    parser = argparse.ArgumentParser(
+        description='Play many headless Fishy games with a bot for every '
+                    'combination of difficulty settings')
+    parser.add_argument('grid', nargs='*', metavar='NAME=VALUES',
+                        help='setting and comma separated values to try, '
+                             'e.g. NUMSHARKS=1,2,3 (one of %s)'
+                             % ', '.join(sorted(SWEEPABLE)))
+    parser.add_argument('--games', type=int, default=20,
+                        help='games per combination')
+    parser.add_argument('--player', choices=('bot', 'random'), default='bot')
+    parser.add_argument('--backend', choices=('objects', 'numpy'))
+    parser.add_argument('--ticks', type=int, default=MAXTICKS,
+                        help='ticks before an unfinished game stops')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--output', help='also write the table as CSV here')
+    args = parser.parse_args()
+
+    try:
+        grid = parseGrid(args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+    names = list(grid[0])
+
+    startTime = time.perf_counter()
+    results = sweep(grid, args.games, args.player, args.backend, args.ticks,
+                    args.seed, args.processes)
+    rows = summarize(results)
+    print(formatTable(rows, names))
+    sys.stderr.write('%d games in %.1f s\n'
+                     % (len(results), time.perf_counter() - startTime))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            writer = csv.DictWriter(f, names + list(COLUMNS))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import random
+import pygame
+import pytest
+import game
+from game import Camera, TickClock, World, makeEnemies
+from headless import ScriptedInput
+
+
+@pytest.mark.parametrize('x, y, zoom', [(0, 0, 1.0), (-1234.5, 777.25, 1.0),
+                                        (310.75, -95.5, 0.5)])
+def test_spawns_never_in_view(x, y, zoom):
+    rng = random.Random(9)
+    camera = Camera()
+    camera.setZoom(zoom)
+    camera.x, camera.y = x, y
+    view = camera.getView()
+    area = camera.getActiveArea()
+    sizes = sorted(rng.choice((1, 15, 60, 200, 500)) for _ in range(5000))
+    positions = camera.getRandomOffCameraPositions(sizes, rng)
+    assert len(positions) == len(sizes)
+    for size, (px, py) in zip(sizes, positions):
+        # the Rect the fish would collide and be drawn with
+        rect = pygame.Rect(px, py, size, size)
+        assert not view.colliderect(rect)
+        assert area.colliderect(rect)
+
+
+class FakeTime(object):
+    """Clock for a TickClock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_tick_clock_alpha():
+    time = FakeTime()
+    clock = TickClock(4, maxCatchUp=5, clock=time)
+    assert clock.advance() == (0, 0.0)  # the first call only starts it
+    time.now += 0.125
+    assert clock.advance() == (0, pytest.approx(0.5))
+    time.now += 0.25
+    assert clock.advance() == (1, pytest.approx(0.5))
+    time.now += 0.5625
+    assert clock.advance() == (2, pytest.approx(0.75))
+
+
+def test_tick_clock_catch_up_cap():
+    time = FakeTime()
+    clock = TickClock(4, maxCatchUp=5, clock=time)
+    clock.advance()
+    time.now += 10.0625  # a 10 s stall is 40 ticks behind
+    ticks, alpha = clock.advance()
+    assert ticks == 5
+    # the ticks that couldn't be caught up are dropped, not kept owing
+    assert alpha == pytest.approx(0.25)
+    time.now += 0.25
+    assert clock.advance() == (1, pytest.approx(0.25))
+    with pytest.raises(ValueError):
+        TickClock(4, maxCatchUp=0)
+
+
+@pytest.mark.parametrize('backend', ['objects', 'numpy'])
+def test_pixel_collisions(backend, monkeypatch):
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    world = World(1, ScriptedInput(), backend)
+    world.player.place(0, 0, 100)
+
+    def touching(x, y, pixels):
+        """Returns if the player eats a fish whose square overlaps its"""
+        monkeypatch.setattr(game, 'PIXELCOLLIDE', pixels)
+        world.enemies = makeEnemies(world.rng, backend)
+        world.enemies.spawnFish(x, y, 20)
+        world.collide()
+        return world.enemies.numFish == 0
+
+    # only the transparent corners of the squares overlap
+    assert touching(90, 90, False)
+    assert not touching(90, 90, True)
+    assert touching(50, 50, True)
+    assert world.player.health == 3
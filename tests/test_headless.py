@@ -0,0 +1,20 @@
+import pytest
+from headless import RandomInput, simulate, fingerprint
+
+BACKENDS = ['objects', 'numpy']
+
+
+def run(seed, backend, ticks=600):
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    return fingerprint(simulate(seed, ticks, RandomInput(seed), backend))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_same_seed_same_fingerprint(backend):
+    assert run(3, backend) == run(3, backend)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_other_seed_other_fingerprint(backend):
+    assert run(3, backend) != run(4, backend)
@@ -0,0 +1,93 @@
+import socket
+import time
+import pytest
+import multiplayer
+from game import Settings
+from multiplayer import (SharedWorld, OceanServer, OceanClient,
+                         encodeSnapshot, decodeSnapshot, INPUT, KEY, HOST,
+                         NOBASE, FISH, SHARK, PLAYER)
+
+OWN = (100, -50, 3, 0)
+BASE = {1: (FISH, 10, 20, 15, 0), 2: (SHARK, -300, 40, 90, 1),
+        3: (FISH, 0, 0, 20, 1)}
+STATE = {1: (FISH, 14, 18, 15, 0),        # moved
+         2: (SHARK, -300, 40, 90, 1),     # unchanged
+         4: (PLAYER, 500, 600, 30, 0),    # new
+         5: (FISH, 70000, 5, 40, 1)}      # new, too far for an offset
+
+
+def test_full_snapshot():
+    data = encodeSnapshot(12, NOBASE, OWN, STATE, {})
+    assert decodeSnapshot(data, {}) == (12, OWN, STATE)
+
+
+def test_delta_snapshot():
+    data = encodeSnapshot(12, 9, OWN, STATE, BASE)
+    assert len(data) < len(encodeSnapshot(12, NOBASE, OWN, STATE, {}))
+    assert decodeSnapshot(data, {9: BASE}) == (12, OWN, STATE)
+    assert BASE[1] == (FISH, 10, 20, 15, 0)  # the base is left alone
+
+
+def test_delta_from_unknown_base():
+    data = encodeSnapshot(12, 9, OWN, STATE, BASE)
+    assert decodeSnapshot(data, {8: BASE}) is None
+
+
+def test_malformed_snapshot():
+    data = encodeSnapshot(12, 9, OWN, STATE, BASE)
+    for bad in (data[:5], data[:-1], data + b'x'):
+        with pytest.raises(ValueError):
+            decodeSnapshot(bad, {9: BASE})
+    with pytest.raises(ValueError):  # moves an entity it never had
+        decodeSnapshot(data, {9: {}})
+    with pytest.raises(ValueError):  # an unknown kind
+        decodeSnapshot(encodeSnapshot(1, NOBASE, OWN, {1: (7, 0, 0, 9, 0)},
+                                      {}), {})
+
+
+def receive(poll):
+    """Polls until the datagrams sent on localhost have arrived"""
+    time.sleep(0.05)
+    poll()
+
+
+def test_bad_packets_dropped():
+    server = OceanServer((HOST, 0))
+    address = server.sock.getsockname()
+    client = OceanClient(address)
+    try:
+        client.poll()  # asks to join
+        receive(server.poll)
+        receive(client.poll)
+        assert client.uid is not None
+        seat = server.world.seats[client.uid]
+        # says it holds 3 keys but only carries one, then an honest one
+        client.sock.sendto(INPUT.pack(b'I', NOBASE, 3) + KEY.pack(0),
+                           address)
+        client.send(multiplayer.MOVEKEYS[:1])
+        receive(server.poll)
+        assert seat.held == set(multiplayer.MOVEKEYS[:1])
+
+        server.tick()
+        spoof = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        spoof.sendto(b'W', client.sock.getsockname())
+        spoof.sendto(b'S\x00', client.sock.getsockname())
+        spoof.close()
+        receive(client.poll)
+        assert client.tick == 1 and PLAYER in [
+            entity[0] for entity in client.state.values()]
+    finally:
+        client.leave()
+        server.close()
+
+
+def test_snapshot_entity_budget(monkeypatch):
+    world = SharedWorld(1, Settings(numEnemyFish=200))
+    seat = world.join()
+    for _ in range(10):
+        world.step()
+    own, state = world.getState(seat)
+    assert len(state) > 5
+    monkeypatch.setattr(multiplayer, 'MAXENTITIES', 5)
+    own, state = world.getState(seat)
+    assert len(state) == 5 and seat.uid in state
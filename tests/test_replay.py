@@ -0,0 +1,39 @@
+import pytest
+import game
+from headless import RandomInput, simulate, fingerprint
+from replay import Replay, loadReplay
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    """Restores the REPLAYSETTINGS a test changes when it ends"""
+    for name in game.REPLAYSETTINGS:
+        monkeypatch.setattr(game, name, getattr(game, name))
+    return monkeypatch
+
+
+def test_save_load(tmp_path):
+    replay = Replay({'NUMENEMYFISH': 12, 'ZOOM': True})
+    simulate(5, 300, replay.record(5, RandomInput(5)))
+    path = str(tmp_path / 'games.replay')
+    replay.save(path)
+    loaded = loadReplay(path)
+    assert loaded.settings == replay.settings
+    assert loaded.games == replay.games
+
+
+def test_replay_reproduces_game(tmp_path, settings):
+    settings.setattr(game, 'NUMENEMYFISH', 12)
+    settings.setattr(game, 'SHARKSPEED', 6)
+    replay = Replay(game.getSettings())
+    world = simulate(5, 500, replay.record(5, RandomInput(5)))
+    path = str(tmp_path / 'games.replay')
+    replay.save(path)
+    settings.setattr(game, 'NUMENEMYFISH', 30)
+    settings.setattr(game, 'SHARKSPEED', 4)
+
+    game.useSettings(loadReplay(path).settings)
+    assert game.Settings().numEnemyFish == 12
+    assert game.Settings().sharkSpeed == 6
+    again = simulate(5, 500, loadReplay(path).play(0))
+    assert fingerprint(again) == fingerprint(world)
@@ -0,0 +1,66 @@
+import pytest
+from game import World
+from headless import RandomInput, ScriptedInput, simulate, fingerprint
+from savestate import encodeWorld, decodeWorld, restoreWorld, RewindBuffer
+
+BACKENDS = ['objects', 'numpy']
+
+
+def played(backend, ticks=400):
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    return simulate(7, ticks, RandomInput(7), backend)
+
+
+def step(world, ticks):
+    for _ in range(ticks):
+        world.step()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_round_trip(backend):
+    world = played(backend)
+    data = encodeWorld(world)
+    copy = World(99, ScriptedInput(), backend)
+    restoreWorld(copy, data)
+    assert fingerprint(copy) == fingerprint(world)
+    assert encodeWorld(copy) == data
+    assert decodeWorld(data)['tick'] == world.tick
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_restored_world_steps_the_same(backend):
+    world = played(backend)
+    copy = World(99, ScriptedInput(), backend)
+    restoreWorld(copy, encodeWorld(world))
+    world.inputs = ScriptedInput()
+    step(world, 300)
+    step(copy, 300)
+    assert fingerprint(copy) == fingerprint(world)
+
+
+def test_other_backend_rejected():
+    pytest.importorskip('numpy')
+    data = encodeWorld(played('objects', 10))
+    with pytest.raises(ValueError):
+        restoreWorld(World(7, ScriptedInput(), 'numpy'), data)
+
+
+def test_rewind():
+    world = World(7, RandomInput(7), 'objects')
+    rewind = RewindBuffer(ticks=100)
+    states = {}
+    for _ in range(150):
+        world.step()
+        rewind.record(world)
+        states[world.tick] = fingerprint(world)
+    first, last = rewind.getTicks()
+    # whole keyframe groups are dropped, so a few more ticks are kept
+    assert last == world.tick
+    assert 100 <= last - first < 100 + rewind.keyframeEvery
+    assert rewind.back(world)
+    assert fingerprint(world) == states[last - 1]
+    assert rewind.restore(world, first + 10)
+    assert fingerprint(world) == states[first + 10]
+    assert rewind.getTicks() == (first, first + 10)
+    assert not rewind.restore(world, first - 1)
@@ -0,0 +1,62 @@
+import random
+import pygame
+from spatial import SpatialHash
+
+
+class Thing(object):
+    """Stands in for a fish, the grid only looks at colrect"""
+
+    def __init__(self, x, y, size):
+        self.colrect = pygame.Rect(x, y, size, size)
+
+
+def check(grid, things, rng):
+    """Compares near() with testing every thing against query rects"""
+    for _ in range(50):
+        rect = pygame.Rect(rng.randint(-600, 600), rng.randint(-600, 600),
+                           rng.randint(1, 400), rng.randint(1, 400))
+        near = grid.near(rect)
+        assert len(near) == len(set(near))
+        assert all(thing in things for thing in near)
+        assert (set(thing for thing in near if rect.colliderect(thing.colrect))
+                == set(thing for thing in things
+                       if rect.colliderect(thing.colrect)))
+
+
+def test_matches_brute_force():
+    rng = random.Random(2)
+    grid = SpatialHash(cellsize=64)
+    things = []
+    for _ in range(200):
+        thing = Thing(rng.randint(-500, 500), rng.randint(-500, 500),
+                      rng.randint(5, 150))
+        grid.update(thing)
+        things.append(thing)
+    assert len(grid) == 200
+    check(grid, things, rng)
+
+    for _ in range(20):
+        # move everything, many across cell edges and the origin
+        for thing in things:
+            thing.colrect.move_ip(rng.randint(-90, 90), rng.randint(-90, 90))
+            grid.update(thing)
+        for thing in rng.sample(things, 5):
+            grid.remove(thing)
+            things.remove(thing)
+        check(grid, things, rng)
+    assert len(grid) == len(things) == 100
+
+
+def test_remove_and_clear():
+    grid = SpatialHash(cellsize=64)
+    thing = Thing(60, 60, 10)  # covers four cells
+    grid.update(thing)
+    assert thing in grid
+    assert grid.near(pygame.Rect(0, 0, 64, 64)) == [thing]
+    assert grid.near(pygame.Rect(64, 64, 1, 1)) == [thing]
+    grid.remove(thing)
+    grid.remove(thing)  # not there any more, nothing happens
+    assert thing not in grid and grid.near(pygame.Rect(0, 0, 200, 200)) == []
+    grid.update(thing)
+    grid.clear()
+    assert len(grid) == 0 and grid.near(thing.colrect) == []
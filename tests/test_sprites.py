@@ -0,0 +1,40 @@
+from fish import FISH_SPRITE, SHARK_SPRITE, PLAYER_SPRITE
+from sprites import SpriteCache
+
+
+def test_hits_and_misses():
+    cache = SpriteCache()
+    image = cache.get(FISH_SPRITE, 20, 'left')
+    assert image.get_size() == (20, 20)
+    assert cache.get(FISH_SPRITE, 20, 'left') is image
+    cache.get(FISH_SPRITE, 20, 'right')
+    cache.get(SHARK_SPRITE, 20, 'left')
+    assert (cache.hits, cache.misses, len(cache)) == (1, 3, 3)
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+
+
+def test_evicts_least_recently_used():
+    cache = SpriteCache(maxsize=2)
+    small = cache.get(FISH_SPRITE, 10, 'left')
+    cache.get(FISH_SPRITE, 11, 'left')
+    assert cache.get(FISH_SPRITE, 10, 'left') is small  # now the newest
+    cache.get(FISH_SPRITE, 12, 'left')  # evicts size 11
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    assert cache.get(FISH_SPRITE, 10, 'left') is small
+    assert cache.get(FISH_SPRITE, 12, 'left').get_size() == (12, 12)
+    assert (cache.hits, cache.misses) == (3, 3)
+    cache.get(FISH_SPRITE, 11, 'left')  # scaled again
+    assert (cache.hits, cache.misses, len(cache)) == (3, 4, 2)
+
+
+def test_overlap_needs_opaque_pixels():
+    cache = SpriteCache()
+    player = (PLAYER_SPRITE, 100, 'left', 0, 0)
+    # the squares share a 10 x 10 corner, both corners are transparent
+    assert not cache.overlap(player, (FISH_SPRITE, 20, 'left', 90, 90))
+    assert cache.overlap(player, (FISH_SPRITE, 20, 'left', 50, 50))
+    assert not cache.overlap(player, (FISH_SPRITE, 20, 'left', 100, 50))
+    assert len(cache) == 0  # masks never fill the image cache